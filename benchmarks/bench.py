@@ -0,0 +1,353 @@
+"""Benchmarks for storage, search and list rendering at growing corpus sizes.
+
+    python benchmarks/bench.py --sizes 10000,100000,1000000 --output bench.json
+    python benchmarks/bench.py --compare old.json new.json
+
+Each size gets its own synthetic links.db (cached in --workdir between runs,
+keyed by size and seed), and every measurement is repeated and reported as
+min/median/p95 milliseconds in one JSON document, so results from two
+commits can be diffed with --compare.
+
+List rendering is timed against a real tk.Listbox when a display is
+available (run under `xvfb-run` on servers), otherwise against a stub with
+the same insert API, which still captures the formatting and per-call cost.
+App startup (to first paint and first rows) is only timed with a display.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from linksaver import LinkPager, LinkStore, SearchCache, UsageBuffer, format_link_row  # noqa: E402
+from linksaver.store import ORDERS  # noqa: E402
+
+SEARCH_TERMS = ["git", "python", "stack overflow", "wiki", "react hooks", "zzqx"]
+FUZZY_TERMS = ["githbu", "stackoverflw", "pyhton dcoker", "kubernets tutorail", "zzqx"]
+TYPING_SEQUENCE = ["p", "py", "pyt", "pyth", "pytho", "python", "python d", "python do", "python doc"]
+VISIBLE_ROWS = 16
+
+# --- Synthetic corpus ---
+WORDS = ("python rust react vue django flask async await docker kubernetes linux kernel sqlite postgres "
+         "index query cache memory thread pool socket http json parser compiler regex unicode tutorial "
+         "guide release notes benchmark profiling testing deploy config security auth token oauth api "
+         "design pattern refactor review debug logging metrics graph tree heap sort search hooks state").split()
+SITES = ["GitHub", "Stack Overflow", "Wikipedia", "YouTube", "Docs", "Blog", "Medium", "Hacker News", "Reddit"]
+TLDS = ["com", "org", "io", "dev", "net", "co.uk", "de"]
+
+def make_link(rng, i):
+    """Returns a (header, url) pair shaped like a real bookmark."""
+    words = rng.sample(WORDS, rng.randint(2, 5))
+    slug = "-".join(words)
+    shape = rng.randrange(7)
+    if shape == 0:
+        url = f"https://github.com/{rng.choice(WORDS)}{rng.randint(1, 999)}/{slug}"
+        site = "GitHub"
+    elif shape == 1:
+        url = f"https://stackoverflow.com/questions/{rng.randint(10**6, 8 * 10**7)}/{slug}"
+        site = "Stack Overflow"
+    elif shape == 2:
+        url = f"https://en.wikipedia.org/wiki/{'_'.join(w.capitalize() for w in words)}"
+        site = "Wikipedia"
+    elif shape == 3:
+        video_id = "".join(rng.choice("abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789-_") for _ in range(11))
+        url = f"https://www.youtube.com/watch?v={video_id}"
+        site = "YouTube"
+    elif shape == 4:
+        url = f"https://docs.{rng.choice(WORDS)}.org/3/library/{words[0]}.html#{words[-1]}"
+        site = "Docs"
+    elif shape == 5:
+        url = (f"https://{rng.choice(WORDS)}.{rng.choice(WORDS)}.{rng.choice(TLDS)}/{rng.randint(2015, 2026)}/"
+               f"{rng.randint(1, 12):02d}/{slug}?utm_source=newsletter&utm_medium=email")
+        site = rng.choice(SITES)
+    else:
+        url = f"https://{rng.choice(WORDS)}.{rng.choice(TLDS)}/{slug}/{i}"
+        site = rng.choice(SITES)
+    header = " ".join(w.capitalize() if j == 0 else w for j, w in enumerate(words))
+    if rng.random() < 0.5:
+        header += f" - {site}"
+    return header, url
+
+def iter_corpus(size, seed):
+    rng = random.Random(seed)
+    for i in range(size):
+        yield make_link(rng, i)
+
+def corpus_db(size, seed, workdir):
+    """Path to a links.db holding `size` synthetic links, built on first use."""
+    path = os.path.join(workdir, f"links-{size}-{seed}.db")
+    if not os.path.exists(path):
+        building = path + ".building"
+        for stale in (building, building + "-wal", building + "-shm"):
+            if os.path.exists(stale):
+                os.remove(stale)
+        store = LinkStore(building)
+        store.add_many(iter_corpus(size, seed), batch_size=20000)
+        store.conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        store.close()
+        os.replace(building, path)
+    return path
+
+# --- Timing ---
+def timed(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return summarize(samples)
+
+def summarize(samples):
+    samples = sorted(samples)
+    return {
+        "n": len(samples),
+        "min_ms": round(samples[0], 3),
+        "median_ms": round(statistics.median(samples), 3),
+        "p95_ms": round(samples[min(len(samples) - 1, int(len(samples) * 0.95))], 3),
+    }
+
+# --- Listbox population ---
+class StubListbox:
+    """Stands in for tk.Listbox when there is no display."""
+
+    def __init__(self):
+        self.items = []
+
+    def delete(self, first, last=None):
+        self.items.clear()
+
+    def insert(self, index, *items):
+        self.items.extend(items)
+
+def has_display():
+    return bool(os.environ.get("DISPLAY")) or sys.platform in ("win32", "darwin")
+
+def make_listbox():
+    if has_display():
+        try:
+            import tkinter as tk
+            root = tk.Tk()
+            root.withdraw()
+            listbox = tk.Listbox(root, height=VISIBLE_ROWS)
+            listbox.pack()
+            return listbox, "tk", root.destroy
+        except Exception:
+            pass
+    return StubListbox(), "stub", lambda: None
+
+def bench_listbox(store, repeat):
+    listbox, kind, cleanup = make_listbox()
+    try:
+        def full_render():
+            # What load_links used to do: every row formatted and inserted one by one
+            listbox.delete(0, "end")
+            for row in store.query():
+                listbox.insert("end", format_link_row(row))
+
+        def virtual_render():
+            pager = LinkPager(store)
+            rows = pager.rows(random.randrange(max(1, pager.total)), VISIBLE_ROWS + 1)
+            listbox.delete(0, "end")
+            listbox.insert("end", *(format_link_row(row) for row in rows))
+
+        return {
+            "listbox": kind,
+            "full_render": timed(full_render, max(1, repeat // 5)),
+            "virtual_render": timed(virtual_render, repeat),
+        }
+    finally:
+        cleanup()
+
+# --- App startup ---
+def bench_gui_startup(path, repeat):
+    """Launches the app until its first rows are shown; None without a display.
+
+    The app reports its own fonts/first-paint/first-rows times
+    (LINKSAVER_STARTUP_REPORT); process_ms adds interpreter start and exit.
+    """
+    if not has_display():
+        return None
+    env = dict(os.environ, LINKSAVER_DB=path, LINKSAVER_FADE="0", LINKSAVER_STARTUP_REPORT="exit")
+    samples = {"fonts_ms": [], "first_paint_ms": [], "first_rows_ms": [], "process_ms": []}
+    for _ in range(max(1, repeat // 5)):
+        start = time.perf_counter()
+        proc = subprocess.run([sys.executable, os.path.join(REPO_ROOT, "linksaverapp.py")], cwd=REPO_ROOT, env=env,
+                              capture_output=True, text=True, timeout=120, check=True)
+        samples["process_ms"].append((time.perf_counter() - start) * 1000)
+        for name, value in json.loads(proc.stderr.strip().splitlines()[-1]).items():
+            samples[name].append(value)
+    return {name: summarize(values) for name, values in samples.items()}
+
+# --- Suite ---
+TAG_FILTERS = ["tag:bench-common", "tag:bench-rare", "tag:bench-rare tag:bench-common", "python tag:bench-common"]
+
+def bench_tags(store, rng, repeat):
+    """Tags half the links and ~0.1% of them, times filtering by those tags, then removes the tags again."""
+    ids = [row[0] for row in store.conn.execute("SELECT id FROM links")]
+    results = {}
+    start = time.perf_counter()
+    store.tag_links(rng.sample(ids, len(ids) // 2), add=["bench-common"])
+    results["tag_bulk"] = {"links": len(ids) // 2, "total_ms": round((time.perf_counter() - start) * 1000, 3)}
+    store.tag_links(rng.sample(ids, max(1, len(ids) // 1000)), add=["bench-rare"])
+    results["count"] = {term: timed(lambda: store.count(term), repeat) for term in TAG_FILTERS}
+    results["first_page"] = {term: timed(lambda: LinkPager(store, term).rows(0, VISIBLE_ROWS + 1), repeat)
+                             for term in TAG_FILTERS}
+    store.tag_search("", remove=["bench-common", "bench-rare"])
+    return results
+
+def bench_orders(store, rng, repeat):
+    """Opens ~1% of the links through a UsageBuffer, times each list order's pages, then clears the usage again."""
+    ids = [row[0] for row in store.conn.execute("SELECT id FROM links")]
+    usage = UsageBuffer()
+    for link_id in rng.choices(ids, k=max(1, len(ids) // 50)):
+        usage.record(link_id, opened_at=rng.randrange(1_600_000_000, 1_700_000_000))
+    start = time.perf_counter()
+    flushed = usage.flush(store)
+    results = {"usage_flush": {"links": flushed, "total_ms": round((time.perf_counter() - start) * 1000, 3)}}
+    for order in ORDERS:
+        pager = LinkPager(store, order=order)
+        results[order] = {
+            "first_page": timed(lambda: LinkPager(store, order=order).rows(0, VISIBLE_ROWS + 1), repeat),
+            "random_page": timed(lambda: pager.rows(rng.randrange(max(1, pager.total)), VISIBLE_ROWS + 1), repeat),
+        }
+    with store.conn:
+        store.conn.execute("UPDATE links SET open_count = 0, last_opened_at = 0 WHERE open_count > 0")
+    return results
+
+def bench_size(size, args):
+    path = corpus_db(size, args.seed, args.workdir)
+    results = {"size": size}
+
+    start = time.perf_counter()
+    store = LinkStore(path)
+    results["store_open_ms"] = round((time.perf_counter() - start) * 1000, 3)
+    results["fts_enabled"] = store.fts_enabled
+    rng = random.Random(args.seed)
+
+    cold, warm = {}, {}
+    for term in SEARCH_TERMS:
+        store.close()
+        store = LinkStore(path) # fresh page cache and statement cache
+        cold[term] = timed(lambda: store.query(term), 1)
+        warm[term] = timed(lambda: store.query(term), args.repeat)
+    results["search_cold"] = cold
+    results["search_warm"] = warm
+    results["count_warm"] = {term: timed(lambda: store.count(term), args.repeat) for term in SEARCH_TERMS}
+    results["search_fuzzy"] = {term: timed(lambda: store.fuzzy_search(term), args.repeat) for term in FUZZY_TERMS}
+
+    cache = SearchCache(store.fts_enabled)
+    def type_sequence():
+        cache.invalidate()
+        for term in TYPING_SEQUENCE:
+            if cache.get(term) is None:
+                cache.put(term, store.query(term))
+    results["as_you_type_cached"] = timed(type_sequence, args.repeat)
+    results["as_you_type_uncached"] = timed(lambda: [store.query(term) for term in TYPING_SEQUENCE], args.repeat)
+
+    results["list_full"] = timed(store.query, max(1, args.repeat // 5))
+    results["list_first_page"] = timed(lambda: LinkPager(store).rows(0, VISIBLE_ROWS + 1), args.repeat)
+    pager = LinkPager(store)
+    results["list_random_page"] = timed(lambda: pager.rows(rng.randrange(max(1, pager.total)), VISIBLE_ROWS + 1), args.repeat)
+    pager = LinkPager(store)
+    start = time.perf_counter()
+    while pager.seed_anchors():
+        pass
+    results["list_anchor_seed_ms"] = round((time.perf_counter() - start) * 1000, 3)
+    results["list_random_page_seeded"] = timed(
+        lambda: pager.rows(rng.randrange(max(1, pager.total)), VISIBLE_ROWS + 1), args.repeat)
+    results["render"] = bench_listbox(store, args.repeat)
+
+    # Writes last, and undone, so the cached corpus stays the same between runs
+    results["tags"] = bench_tags(store, rng, args.repeat)
+    results["orders"] = bench_orders(store, rng, args.repeat)
+    inserted_ids = []
+    def insert_one():
+        inserted_ids.append(store.add("Benchmark insert", f"https://bench.example/{len(inserted_ids)}-{time.time_ns()}"))
+    results["insert_single"] = timed(insert_one, args.repeat)
+    results["delete_single"] = timed(lambda: store.delete(inserted_ids.pop()), args.repeat)
+
+    bulk = [(h, f"https://bulk.example/{i}") for i, (h, _) in enumerate(iter_corpus(args.bulk, args.seed + 1))]
+    start = time.perf_counter()
+    store.add_many(bulk, batch_size=5000)
+    results["insert_bulk"] = {"rows": len(bulk), "total_ms": round((time.perf_counter() - start) * 1000, 3)}
+    store.delete_many([row[0] for row in store.conn.execute("SELECT id FROM links WHERE url LIKE 'https://bulk.example/%'")])
+    store.close()
+
+    results["cli_startup"] = timed(lambda: subprocess.run(
+        [sys.executable, "-m", "linksaver", "--db", path, "search", "python", "--limit", "1"],
+        cwd=REPO_ROOT, stdout=subprocess.DEVNULL, check=True), max(1, args.repeat // 5))
+    results["gui_startup"] = bench_gui_startup(path, args.repeat)
+    return results
+
+def environment():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT,
+                                capture_output=True, text=True).stdout.strip()
+    except OSError:
+        commit = ""
+    return {"commit": commit, "python": platform.python_version(), "sqlite": sqlite3.sqlite_version,
+            "platform": platform.platform()}
+
+def compare(old_path, new_path):
+    """Prints the median of every metric in two result files side by side."""
+    with open(old_path) as f:
+        old = {r["size"]: r for r in json.load(f)["results"]}
+    with open(new_path) as f:
+        new = {r["size"]: r for r in json.load(f)["results"]}
+
+    def medians(prefix, node):
+        if isinstance(node, dict) and "median_ms" in node:
+            yield prefix, node["median_ms"]
+        elif isinstance(node, dict):
+            for key, value in node.items():
+                yield from medians(f"{prefix}.{key}" if prefix else key, value)
+
+    for size in sorted(set(old) & set(new)):
+        old_medians = dict(medians("", old[size]))
+        for name, value in medians("", new[size]):
+            if name in old_medians and old_medians[name] > 0:
+                ratio = value / old_medians[name]
+                flag = "  <-- slower" if ratio > 1.2 else ""
+                print(f"{size:>9,}  {name:<40} {old_medians[name]:>10.2f} -> {value:>10.2f} ms  x{ratio:.2f}{flag}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="10000,100000", help="comma-separated corpus sizes (default: %(default)s)")
+    parser.add_argument("--repeat", type=int, default=20, help="samples per measurement (default: %(default)s)")
+    parser.add_argument("--bulk", type=int, default=10000, help="rows in the bulk insert (default: %(default)s)")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--workdir", default=os.path.join(tempfile.gettempdir(), "linksaver-bench"),
+                        help="where corpus databases are cached (default: %(default)s)")
+    parser.add_argument("--output", help="write JSON here instead of stdout")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"), help="compare two result files and exit")
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        compare(*args.compare)
+        return 0
+
+    os.makedirs(args.workdir, exist_ok=True)
+    report = {"environment": environment(), "results": []}
+    for size in (int(s) for s in args.sizes.split(",")):
+        print(f"Benchmarking {size:,} links...", file=sys.stderr)
+        report["results"].append(bench_size(size, args))
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,10 @@
+"""Link Saver core: storage, search and formatting, importable without tkinter.
+
+The GUI (linksaverapp.py) and the CLI (python -m linksaver) are thin layers
+over these modules.
+"""
+from .display import format_link_row
+from .search import SearchCache, build_fts_query, search_tokens
+from .store import DEFAULT_DB_PATH, LinkPager, LinkStore, ListPager, RankedPager, nocase_key, row_key
+from .urls import normalize_url
+from .usage import UsageBuffer
@@ -0,0 +1,167 @@
+"""Streaming bookmark import/export (Netscape HTML, CSV, JSON Lines).
+
+Bookmark files are read and written as streams, so neither side ever holds
+the whole file or table in memory. Netscape bookmark HTML is what every
+browser exports; CSV has header,url columns.
+"""
+import csv
+import html
+import itertools
+import json
+import os
+from html.parser import HTMLParser
+
+from .urls import is_web_url, normalize_url
+
+IMPORT_BATCH_SIZE = 5000
+FILE_FORMATS = {".html": "html", ".htm": "html", ".csv": "csv", ".jsonl": "jsonl", ".ndjson": "jsonl"}
+READ_CHUNK_SIZE = 64 * 1024
+
+def detect_format(path, file_format=None):
+    if file_format:
+        return file_format
+    extension = os.path.splitext(path)[1].lower()
+    if extension not in FILE_FORMATS:
+        raise ValueError(f"Can't tell the format of '{path}'; use one of: html, csv, jsonl")
+    return FILE_FORMATS[extension]
+
+class NetscapeBookmarkParser(HTMLParser):
+    """Collects (title, href) pairs from <A> tags as HTML is fed in chunks."""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.links = []
+        self._href = None
+        self._text = []
+
+    def handle_starttag(self, tag, attrs):
+        if tag == "a":
+            self._href = dict(attrs).get("href")
+            self._text = []
+
+    def handle_data(self, data):
+        if self._href is not None:
+            self._text.append(data)
+
+    def handle_endtag(self, tag):
+        if tag == "a" and self._href is not None:
+            self.links.append(("".join(self._text).strip(), self._href))
+            self._href = None
+
+def read_netscape_html(f):
+    parser = NetscapeBookmarkParser()
+    while True:
+        chunk = f.read(READ_CHUNK_SIZE)
+        if not chunk:
+            break
+        parser.feed(chunk)
+        yield from parser.links
+        parser.links.clear()
+    parser.close()
+    yield from parser.links
+
+CSV_URL_COLUMNS = ("url", "href", "link")
+CSV_HEADER_COLUMNS = ("header", "title", "name")
+
+def csv_records(reader):
+    """Yields the reader's records, and None for each one it can't parse (e.g. a field over the size limit)."""
+    while True:
+        try:
+            yield next(reader)
+        except StopIteration:
+            return
+        except csv.Error:
+            yield None
+
+def read_csv(f):
+    records = csv_records(csv.reader(f))
+    for first in records:
+        break
+    else:
+        return # Empty file
+    columns = [c.strip().lower() for c in first or ()]
+    url_col = next((columns.index(c) for c in CSV_URL_COLUMNS if c in columns), None)
+    if url_col is None:
+        # No column names: header,url by position, and the first line is data
+        header_col, url_col = 0, 1
+        records = itertools.chain([first], records)
+    else:
+        header_col = next((columns.index(c) for c in CSV_HEADER_COLUMNS if c in columns), None)
+    for record in records:
+        if record is None:
+            yield "", "" # Unparseable: skipped like a record without a URL
+            continue
+        url = record[url_col] if url_col < len(record) else ""
+        header = record[header_col] if header_col is not None and header_col < len(record) else ""
+        yield header, url
+
+def read_jsonl(f):
+    for line in f:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError: # Truncated or otherwise broken line
+            record = None
+        if not isinstance(record, dict):
+            yield "", "" # Not a link record: skipped like one without a URL
+            continue
+        header = record.get("header") or record.get("title") or ""
+        url = record.get("url") or record.get("href") or ""
+        yield (header if isinstance(header, str) else ""), (url if isinstance(url, str) else "")
+
+READERS = {"html": read_netscape_html, "csv": read_csv, "jsonl": read_jsonl}
+
+def import_links(store, path, file_format=None, progress=None, batch_size=IMPORT_BATCH_SIZE):
+    """Streams a bookmark file into the store.
+
+    Returns {"inserted", "duplicates", "skipped"}; rows that can't be
+    parsed, have no URL, or have a scheme other than http(s) (bookmarklets,
+    place: queries, mailto:) are skipped, and a missing header falls back
+    to the URL.
+    """
+    reader = READERS[detect_format(path, file_format)]
+    skipped = 0
+
+    def rows(f):
+        nonlocal skipped
+        for header, url in reader(f):
+            url = url.strip()
+            if not url or not is_web_url(url):
+                skipped += 1
+                continue
+            url = normalize_url(url)
+            yield (header.strip() or url), url
+
+    with open(path, encoding="utf-8", errors="replace", newline="") as f:
+        inserted, duplicates = store.add_many(rows(f), batch_size, progress)
+    return {"inserted": inserted, "duplicates": duplicates, "skipped": skipped}
+
+def export_links(store, path, file_format=None, progress=None, progress_every=IMPORT_BATCH_SIZE):
+    """Streams every link to a bookmark file in list order. Returns the number written."""
+    file_format = detect_format(path, file_format)
+    written = 0
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        if file_format == "html":
+            f.write("<!DOCTYPE NETSCAPE-Bookmark-file-1>\n"
+                    '<META HTTP-EQUIV="Content-Type" CONTENT="text/html; charset=UTF-8">\n'
+                    "<TITLE>Bookmarks</TITLE>\n<H1>Bookmarks</H1>\n<DL><p>\n")
+        elif file_format == "csv":
+            writer = csv.writer(f)
+            writer.writerow(["header", "url"])
+        for link_id, header, url in store.iter_all():
+            if file_format == "html":
+                f.write(f'    <DT><A HREF="{html.escape(url)}">{html.escape(header)}</A>\n')
+            elif file_format == "csv":
+                writer.writerow([header, url])
+            else:
+                f.write(json.dumps({"header": header, "url": url}, ensure_ascii=False) + "\n")
+            written += 1
+            if progress and written % progress_every == 0:
+                progress(written)
+        if file_format == "html":
+            f.write("</DL><p>\n")
+    if progress:
+        progress(written)
+    return written
@@ -0,0 +1,155 @@
+"""Headless command line: `python -m linksaver add|search|delete|tag|tags|import|export|check`.
+
+Never imports tkinter, so it starts fast and runs on machines without a
+display. Import/export and health-check modules are only loaded by the
+commands that use them.
+"""
+import argparse
+import sqlite3
+import sys
+
+from .display import format_link_row
+from .perf import dump_on_exit, tracer
+from .store import DEFAULT_DB_PATH, ORDERS, LinkStore
+from .urls import normalize_url
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="linksaver", description="Link Saver Pro from the command line")
+    parser.add_argument("--db", default=DEFAULT_DB_PATH, help="database file (default: %(default)s)")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    add = commands.add_parser("add", help="save a link")
+    add.add_argument("header")
+    add.add_argument("url")
+
+    search = commands.add_parser("search", help="list links matching a search (all links if no term; is:dead for dead links, tag:NAME for tagged ones)")
+    search.add_argument("term", nargs="?", default="")
+    search.add_argument("--limit", type=int, default=-1, help="show at most this many results")
+    search.add_argument("--order", choices=list(ORDERS), default="header", help="list order (default: %(default)s)")
+    search.add_argument("--rank", action="store_true", help="order by relevance instead (overrides --order)")
+    search.add_argument("--fuzzy", action="store_true", help="tolerate typos; best matches first (50 unless --limit)")
+    search.add_argument("--full", action="store_true", help="print full URLs instead of the list display")
+
+    delete = commands.add_parser("delete", help="delete links by id")
+    delete.add_argument("ids", nargs="+", type=int)
+
+    tag = commands.add_parser("tag", help="add or remove tags on links, by id or on every link matching --search")
+    tag.add_argument("ids", nargs="*", type=int)
+    tag.add_argument("--add", action="append", default=[], metavar="TAG", help="tag to add (repeatable)")
+    tag.add_argument("--remove", action="append", default=[], metavar="TAG", help="tag to remove (repeatable)")
+    tag.add_argument("--search", metavar="TERM", help="tag every link matching TERM instead of the given ids")
+
+    commands.add_parser("tags", help="list tags with their link counts")
+
+    for name in ("import", "export"):
+        command = commands.add_parser(name, help=f"{name} bookmarks (html, csv or jsonl)")
+        command.add_argument("file")
+        command.add_argument("--format", choices=["csv", "html", "jsonl"], help="default: from the file extension")
+
+    check = commands.add_parser("check", help="check which links are dead (resumes; Ctrl+C stops)")
+    check.add_argument("--concurrency", type=int, default=32, help="requests in flight (default: %(default)s)")
+    check.add_argument("--per-host", type=int, default=2, help="requests in flight per host (default: %(default)s)")
+    check.add_argument("--rate", type=float, default=20.0, help="requests per second, 0 for no limit (default: %(default)s)")
+    check.add_argument("--timeout", type=float, default=10.0, help="seconds per request (default: %(default)s)")
+    check.add_argument("--max-age", type=float, default=24.0,
+                       help="skip links checked within this many hours (default: %(default)s)")
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    store = LinkStore(args.db)
+    try:
+        return COMMANDS[args.command](store, args)
+    except (OSError, ValueError, sqlite3.Error) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    finally:
+        store.close()
+        if tracer.enabled:
+            report_timings()
+
+def report_timings():
+    """Prints the span histograms to stderr (LINKSAVER_PERF=1) and writes LINKSAVER_TRACE."""
+    for name, stats in tracer.summary().items():
+        print(f"{name:<20} n={stats['count']:<6} p50={stats['p50_ms']:.3f} p90={stats['p90_ms']:.3f} "
+              f"p99={stats['p99_ms']:.3f} max={stats['max_ms']:.3f} ms", file=sys.stderr)
+    path = dump_on_exit()
+    if path:
+        print(f"Trace written to {path}", file=sys.stderr)
+
+def cmd_add(store, args):
+    header, url = args.header.strip(), args.url.strip()
+    if not header or not url:
+        print("Error: Both a header and a URL are required.", file=sys.stderr)
+        return 1
+    url = normalize_url(url)
+    try:
+        link_id = store.add(header, url)
+    except sqlite3.IntegrityError:
+        print(f"Error: The URL '{url}' already exists.", file=sys.stderr)
+        return 1
+    print(link_id)
+    return 0
+
+def cmd_search(store, args):
+    if args.fuzzy:
+        rows = store.fuzzy_search(args.term, k=args.limit if args.limit >= 0 else 50)
+    else:
+        rows = store.query(args.term, order="rank" if args.rank else args.order, limit=args.limit)
+    for row in rows:
+        link_id, header, url = row
+        print(f"{link_id}\t{header}\t{url}" if args.full else f"{link_id}\t{format_link_row(row).strip()}")
+    return 0
+
+def cmd_delete(store, args):
+    missing = [link_id for link_id in args.ids if not store.delete(link_id)]
+    for link_id in missing:
+        print(f"Error: No link with id {link_id}.", file=sys.stderr)
+    return 1 if missing else 0
+
+def cmd_tag(store, args):
+    if bool(args.ids) == (args.search is not None):
+        print("Error: Give either link ids or --search.", file=sys.stderr)
+        return 1
+    if args.search is not None:
+        changed = store.tag_search(args.search, args.add, args.remove)
+    else:
+        changed = store.tag_links(args.ids, args.add, args.remove)
+    print(f"{changed:,} tag assignments changed.")
+    return 0
+
+def cmd_tags(store, args):
+    for name, count in store.tags():
+        print(f"{count}\t{name}")
+    return 0
+
+def cmd_import(store, args):
+    from .bookmarks import import_links
+    result = import_links(store, args.file, args.format,
+                          progress=lambda n, d: print(f"\r{n:,} imported, {d:,} duplicates", end="", file=sys.stderr))
+    print(file=sys.stderr)
+    print(f"Imported {result['inserted']:,} links ({result['duplicates']:,} duplicates, {result['skipped']:,} skipped).")
+    return 0
+
+def cmd_export(store, args):
+    from .bookmarks import export_links
+    count = export_links(store, args.file, args.format)
+    print(f"Exported {count:,} links to {args.file}.")
+    return 0
+
+def cmd_check(store, args):
+    from .health import HealthChecker
+    checker = HealthChecker(store.db_path, concurrency=args.concurrency, per_host=args.per_host, rate=args.rate,
+                            timeout=args.timeout, max_age=int(args.max_age * 3600),
+                            progress=lambda n, d, t: print(f"\r{n:,}/{t:,} checked, {d:,} dead", end="", file=sys.stderr))
+    try:
+        result = checker.run()
+    except KeyboardInterrupt:
+        result = {"checked": checker.checked, "dead": checker.dead, "cancelled": True}
+    print(file=sys.stderr)
+    verb = "Stopped after checking" if result["cancelled"] else "Checked"
+    print(f"{verb} {result['checked']:,} links, {result['dead']:,} dead. List them with: search is:dead")
+    return 0
+
+COMMANDS = {"add": cmd_add, "search": cmd_search, "delete": cmd_delete, "tag": cmd_tag, "tags": cmd_tags,
+            "import": cmd_import, "export": cmd_export, "check": cmd_check}
@@ -0,0 +1,14 @@
+"""Display formatting shared by the GUI and the CLI."""
+
+def format_link_row(row, max_url_len=35):
+    """Builds the listbox text for a row, truncating long URLs to their domain."""
+    link_id, header, url = row
+    display_url = url
+    if len(url) > max_url_len:
+        scheme_end = url.find("://") + 3
+        domain_part = url[scheme_end:].split('/')[0]
+        if len(domain_part) < max_url_len - 5:
+            display_url = url[:scheme_end] + domain_part + "/..."
+        else:
+            display_url = url[:max_url_len - 3] + "..."
+    return f" {header}  ({display_url})"
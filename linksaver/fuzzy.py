@@ -0,0 +1,201 @@
+"""Typo-tolerant search over a trigram index of the link vocabulary.
+
+Rather than indexing every trigram of every link, the index holds the
+trigrams of each distinct *word* (fuzzy_trigrams), with a per-word document
+count (fuzzy_terms) that add/delete keep up to date. A fuzzy search then
+runs in two small steps:
+
+1. Each query word is corrected to the few most similar vocabulary words.
+   Candidates sharing trigrams with it are looked up by (trigram, length)
+   and scored by trigram overlap (Jaccard) or, for transpositions and
+   short words that overlap little, by edit distance.
+2. Combinations of corrections are scored, and the best are run as exact
+   FTS queries, header-only matches first. Every link found by one query has
+   the same score, so results come out best-first, and the search stops
+   after k links. Only the best combinations are generated, through a
+   bounded heap, and the full match set is never sorted.
+"""
+import heapq
+import re
+from collections import Counter
+
+from .search import fold_text, search_tokens
+
+FUZZY_SCHEMA = [
+    "CREATE TABLE IF NOT EXISTS fuzzy_terms (term TEXT PRIMARY KEY, doc_count INTEGER NOT NULL) WITHOUT ROWID",
+    """
+    CREATE TABLE IF NOT EXISTS fuzzy_trigrams (
+        gram TEXT NOT NULL,
+        len INTEGER NOT NULL,
+        term TEXT NOT NULL,
+        PRIMARY KEY (gram, len, term)
+    ) WITHOUT ROWID
+    """,
+]
+
+MIN_SIMILARITY = 0.3 # Jaccard trigram overlap a correction needs...
+MAX_EDITS = ((4, 1), (8, 2)) # ...or else edits allowed, by word length (3 beyond)
+MAX_CORRECTIONS = 6 # per query word
+MAX_COMBINATIONS = 24
+HEADER_WEIGHT = 2.0 # all words found in the header
+ANY_WEIGHT = 1.0 # words found anywhere (the URL included)
+MAX_TERM_LEN = 30 # longer "words" are IDs and hashes, not worth correcting
+
+def trigrams(word):
+    """The distinct trigrams of a word padded with '$$' and '$', so a word of n letters has about n + 1.
+
+    The double padding adds a gram for the first letter alone, which
+    short words with a typo often have as their only gram in common.
+    """
+    padded = f"$${word}$"
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+def link_terms(header, url):
+    """The words of a link that go in the fuzzy vocabulary."""
+    text = fold_text(header) + " " + fold_text(url)
+    return {t for t in search_tokens(text) if t.isalpha() and 2 <= len(t) <= MAX_TERM_LEN}
+
+def index_links(conn, rows, delta):
+    """Adds (delta=1) or removes (delta=-1) the words of (header, url) rows from the vocabulary.
+
+    Runs inside the caller's transaction. New words get their trigrams
+    indexed; words no link uses any more are dropped.
+    """
+    counts = Counter()
+    for header, url in rows:
+        counts.update(link_terms(header, url))
+    for term, count in counts.items():
+        if delta > 0:
+            if conn.execute("INSERT OR IGNORE INTO fuzzy_terms (term, doc_count) VALUES (?, 0)", (term,)).rowcount:
+                conn.executemany("INSERT OR IGNORE INTO fuzzy_trigrams (gram, len, term) VALUES (?, ?, ?)",
+                                 [(gram, len(term), term) for gram in trigrams(term)])
+            conn.execute("UPDATE fuzzy_terms SET doc_count = doc_count + ? WHERE term = ?", (count, term))
+        else:
+            conn.execute("UPDATE fuzzy_terms SET doc_count = doc_count - ? WHERE term = ?", (count, term))
+            if conn.execute("DELETE FROM fuzzy_terms WHERE term = ? AND doc_count <= 0", (term,)).rowcount:
+                conn.executemany("DELETE FROM fuzzy_trigrams WHERE gram = ? AND len = ? AND term = ?",
+                                 [(gram, len(term), term) for gram in trigrams(term)])
+
+def rebuild_index(conn, batch_size=5000):
+    """Fills the vocabulary from every saved link (migration for older databases)."""
+    conn.execute("DELETE FROM fuzzy_terms")
+    conn.execute("DELETE FROM fuzzy_trigrams")
+    cursor = conn.execute("SELECT header, url FROM links")
+    while True:
+        rows = cursor.fetchmany(batch_size)
+        if not rows:
+            break
+        index_links(conn, rows, 1)
+
+def corrections(conn, word):
+    """Returns up to MAX_CORRECTIONS (term, similarity) pairs for a query word, best first."""
+    grams = trigrams(word)
+    # A word can only come close to terms of similar length
+    max_edits = allowed_edits(word)
+    slack = max(max_edits, int(len(word) * (1 - MIN_SIMILARITY)))
+    placeholders = ",".join("?" * len(grams))
+    shared = conn.execute(
+        f"SELECT term, COUNT(*) FROM fuzzy_trigrams WHERE gram IN ({placeholders}) AND len BETWEEN ? AND ?"
+        " GROUP BY term HAVING COUNT(*) >= ?",
+        [*grams, len(word) - slack, len(word) + slack, 1 if len(word) <= 4 else 2])
+    scored = []
+    for term, overlap in shared:
+        similarity = 1.0 if term == word else overlap / (len(grams) + len(trigrams(term)) - overlap)
+        if similarity < MIN_SIMILARITY:
+            edits = edit_distance(word, term, max_edits)
+            if edits > max_edits:
+                continue
+            similarity = max(similarity, 1 - edits / max(len(word), len(term)))
+        scored.append((similarity, term))
+    return [(term, similarity) for similarity, term in heapq.nlargest(MAX_CORRECTIONS, scored)]
+
+def allowed_edits(word):
+    return next((edits for length, edits in MAX_EDITS if len(word) <= length), 3)
+
+def edit_distance(a, b, limit):
+    """Optimal string alignment distance (a swap of neighbours counts as one edit).
+
+    Stops early and returns limit + 1 once every alignment costs more than limit.
+    """
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    before, previous = None, list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        for j, cb in enumerate(b, 1):
+            cost = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != cb))
+            if i > 1 and j > 1 and ca == b[j - 2] and a[i - 2] == cb:
+                cost = min(cost, before[j - 2] + 1)
+            current.append(cost)
+        if min(current) > limit:
+            return limit + 1
+        before, previous = previous, current
+    return previous[-1]
+
+def best_combinations(options, limit):
+    """Yields (score, terms) for the `limit` best picks of one term per word, best first.
+
+    options[i] is word i's corrections sorted by similarity; score is the
+    mean similarity. Lazily expands a heap instead of building the product.
+    """
+    if not options or any(not o for o in options):
+        return
+    start = (0,) * len(options)
+    heap = [(-sum(o[0][1] for o in options), start)]
+    seen = {start}
+    while heap and limit > 0:
+        negative_total, picks = heapq.heappop(heap)
+        yield -negative_total / len(options), [options[i][p][0] for i, p in enumerate(picks)]
+        limit -= 1
+        for i, p in enumerate(picks):
+            if p + 1 < len(options[i]):
+                nxt = picks[:i] + (p + 1,) + picks[i + 1:]
+                if nxt not in seen:
+                    seen.add(nxt)
+                    total = sum(options[j][q][1] for j, q in enumerate(nxt))
+                    heapq.heappush(heap, (-total, nxt))
+
+def fuzzy_search(store, search_term, k=50):
+    """Returns up to k (id, header, url) rows for search_term, best match first, tolerating typos."""
+    words = [w for w in search_tokens(fold_text(search_term)) if w]
+    if not words:
+        return []
+    conn = store.conn
+    options = []
+    for word in words:
+        found = corrections(conn, word) if len(word) >= 3 else []
+        options.append(found or [(word, 1.0)])
+
+    # Each (combination, column) is one exact query; rank them all, best first
+    candidates = []
+    for score, terms in best_combinations(options, MAX_COMBINATIONS):
+        candidates.append((score * HEADER_WEIGHT, terms, True))
+        candidates.append((score * ANY_WEIGHT, terms, False))
+    candidates.sort(key=lambda c: -c[0])
+
+    results, seen = [], set()
+    for _, terms, header_only in candidates:
+        remaining = k - len(results)
+        if remaining <= 0:
+            break
+        for row in _exact_matches(store, terms, header_only, remaining + len(seen)):
+            if row[0] not in seen:
+                seen.add(row[0])
+                results.append(row)
+                if len(results) >= k:
+                    break
+    return results
+
+def _exact_matches(store, terms, header_only, limit):
+    if store.fts_enabled:
+        phrase = " ".join(f'"{term}"' for term in terms)
+        match = f"header : ({phrase})" if header_only else phrase
+        return store.conn.execute(
+            "SELECT links.id, links.header, links.url FROM links_fts JOIN links ON links.id = links_fts.rowid"
+            " WHERE links_fts MATCH ? LIMIT ?", (match, limit))
+    # Without FTS5: whole-word-ish substring matches, still streamed with LIMIT
+    columns = ["LOWER(links.header)"] if header_only else ["LOWER(links.header)", "LOWER(links.url)"]
+    conditions = " AND ".join("(" + " OR ".join(f"{c} LIKE ?" for c in columns) + ")" for _ in terms)
+    params = [f"%{re.sub(r'[%_]', '', term)}%" for term in terms for _ in columns]
+    return store.conn.execute(f"SELECT links.id, links.header, links.url FROM links WHERE {conditions} LIMIT ?",
+                              params + [limit])
@@ -0,0 +1,389 @@
+"""Background link health checks: which saved links still answer, and how fast.
+
+    checker = HealthChecker("links.db", progress=print)
+    summary = checker.run()        # blocks; call checker.cancel() from another thread to stop
+
+Links are streamed from the store in id order, a batch at a time, and fed
+to a fixed pool of asyncio workers host by host: a link whose host already
+has per_host requests under way waits in that host's queue, so the workers
+move on to other hosts instead of idling behind one busy site. Each link gets a HEAD request (retried
+as GET when HEAD is refused or errors), following redirects, with
+If-None-Match / If-Modified-Since from its previous check so unchanged
+pages answer 304 without a body. Concurrency is capped overall and per
+host, requests are spaced out by a global rate limit, and connections are
+kept alive and reused per host.
+
+Results are written to link_health in small transactions as they come in,
+so a cancelled or crashed run loses at most one batch, and the next run
+resumes: links checked within max_age seconds are skipped.
+
+Only the standard library is used: HTTP/1.1 is spoken directly over
+asyncio streams.
+"""
+import asyncio
+import ssl
+import threading
+import time
+from collections import deque
+from urllib.parse import urljoin, urlsplit
+
+from .store import LinkStore
+
+USER_AGENT = "LinkSaverPro-HealthCheck/1.0"
+REDIRECT_STATUSES = {301, 302, 303, 307, 308}
+DEAD_STATUSES = {404, 410, 451}
+MAX_REDIRECTS = 5
+MAX_HEADERS = 100
+MAX_DRAINED_BODY = 256 * 1024 # a bigger GET body closes the connection instead of being read
+UNSUPPORTED = "unsupported scheme"
+
+def is_dead(status, error):
+    """Whether a check result means the link is gone.
+
+    No response at all (DNS failure, refused, timeout), gone statuses and
+    server errors count as dead. 401/403/429 and the like mean the page is
+    there but unwilling, so they don't.
+    """
+    if status is None:
+        return error is not None and error != UNSUPPORTED
+    return status in DEAD_STATUSES or status >= 500
+
+class CheckError(Exception):
+    """A request that got no usable HTTP response."""
+
+class ConnectionPool:
+    """Keep-alive HTTP/1.1 connections, reused per (scheme, host, port)."""
+
+    def __init__(self, max_idle_per_host=2):
+        self.max_idle_per_host = max_idle_per_host
+        self._idle = {}
+        self._ssl = ssl.create_default_context()
+
+    async def acquire(self, key):
+        """Returns (reader, writer, reused) for key, reusing an idle connection if one is alive."""
+        idle = self._idle.get(key)
+        while idle:
+            reader, writer = idle.pop()
+            if not writer.is_closing() and not reader.at_eof():
+                return reader, writer, True
+            writer.close()
+        scheme, host, port = key
+        reader, writer = await asyncio.open_connection(
+            host, port, ssl=self._ssl if scheme == "https" else None,
+            server_hostname=host if scheme == "https" else None, limit=64 * 1024)
+        return reader, writer, False
+
+    def release(self, key, connection, reusable):
+        reader, writer = connection
+        idle = self._idle.setdefault(key, [])
+        if reusable and len(idle) < self.max_idle_per_host and not writer.is_closing():
+            idle.append(connection)
+        else:
+            writer.close()
+
+    def close(self):
+        for idle in self._idle.values():
+            for _, writer in idle:
+                writer.close()
+        self._idle.clear()
+
+class RateLimiter:
+    """Spaces request starts at least 1/rate seconds apart (rate <= 0: unlimited)."""
+
+    def __init__(self, rate):
+        self.interval = 1 / rate if rate > 0 else 0
+        self._next = 0.0
+
+    async def wait(self):
+        if not self.interval:
+            return
+        now = asyncio.get_running_loop().time()
+        slot = max(now, self._next)
+        self._next = slot + self.interval
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+class HealthChecker:
+    """Checks every link not checked within max_age seconds; see the module docstring.
+
+    progress(checked, dead, total) is called from the checker's thread after
+    each write to the database. run() returns a summary dict.
+    """
+
+    def __init__(self, db_path, concurrency=32, per_host=2, rate=20.0, timeout=10.0, max_age=24 * 3600,
+                 batch_size=500, progress=None):
+        self.db_path = db_path
+        self.concurrency = concurrency
+        self.per_host = per_host
+        self.rate = rate
+        self.timeout = timeout
+        self.max_age = max_age
+        self.batch_size = batch_size
+        self.progress = progress
+        self.checked = self.dead = self.total = 0
+        self._cancelled = threading.Event()
+        self._loop = None
+        self._task = None
+
+    def run(self):
+        store = LinkStore(self.db_path)
+        try:
+            return asyncio.run(self._main(store))
+        finally:
+            store.close()
+
+    def cancel(self):
+        """Stops the run from any thread; results written so far are kept."""
+        self._cancelled.set()
+        loop, task = self._loop, self._task
+        if loop is not None and task is not None:
+            loop.call_soon_threadsafe(task.cancel)
+
+    async def _main(self, store):
+        self._loop = asyncio.get_running_loop()
+        self._task = asyncio.current_task()
+        checked_before = int(time.time()) - self.max_age
+        self.total = store.health_pending(checked_before)
+        pool = ConnectionPool(max_idle_per_host=self.per_host)
+        limiter = RateLimiter(self.rate)
+        ready = asyncio.Queue() # (row, host) whose host had a free slot; None tells a worker to stop
+        parked = {} # host -> deque of rows waiting for one of that host's slots
+        active = {} # host -> its rows that are queued in `ready` or being checked
+        max_ready, max_parked = self.concurrency * 2, self.batch_size * 4
+        space = asyncio.Event() # set whenever `ready` or `parked` shrinks
+        parked_count = 0
+        pending_rows = []
+        producing = True
+        cancelled = False
+
+        def flush():
+            if pending_rows:
+                store.save_health(pending_rows)
+                pending_rows.clear()
+                if self.progress:
+                    self.progress(self.checked, self.dead, self.total)
+
+        def schedule(row):
+            nonlocal parked_count
+            try:
+                host = urlsplit(row[1]).hostname or ""
+            except ValueError:
+                host = ""
+            if active.get(host, 0) < self.per_host:
+                active[host] = active.get(host, 0) + 1
+                ready.put_nowait((row, host))
+            else:
+                parked.setdefault(host, deque()).append(row)
+                parked_count += 1
+
+        def finished(host):
+            """Hands the host's slot to its next parked row, or frees it."""
+            nonlocal parked_count
+            waiting = parked.get(host)
+            if waiting:
+                ready.put_nowait((waiting.popleft(), host))
+                parked_count -= 1
+                if not waiting:
+                    del parked[host]
+                space.set()
+                return
+            active[host] -= 1
+            if not active[host]:
+                del active[host]
+            if not producing and not active:
+                stop_workers()
+
+        def stop_workers():
+            for _ in range(self.concurrency):
+                ready.put_nowait(None)
+
+        async def produce():
+            nonlocal producing
+            after_id = 0
+            while not self._cancelled.is_set():
+                batch = store.health_batch(after_id, checked_before, self.batch_size)
+                if not batch:
+                    break
+                for row in batch:
+                    while ready.qsize() >= max_ready or parked_count >= max_parked:
+                        space.clear()
+                        await space.wait()
+                    schedule(row)
+                after_id = batch[-1][0]
+            producing = False
+            if not active: # Otherwise the last finished() stops them
+                stop_workers()
+
+        async def work():
+            while True:
+                item = await ready.get()
+                space.set()
+                if item is None:
+                    return
+                (link_id, url, etag, last_modified), host = item
+                try:
+                    result = await self.check(pool, limiter, url, etag, last_modified)
+                except Exception as e: # One odd link must not end the whole run
+                    result = (None, describe_error(e), None, etag, last_modified)
+                finished(host)
+                status, error, latency_ms, etag, last_modified = result
+                dead = is_dead(status, error)
+                pending_rows.append((link_id, status, error, latency_ms, int(time.time()), etag, last_modified, int(dead)))
+                self.checked += 1
+                self.dead += dead
+                if len(pending_rows) >= 100:
+                    flush()
+
+        tasks = [asyncio.create_task(produce())] + [asyncio.create_task(work()) for _ in range(self.concurrency)]
+        try:
+            await asyncio.gather(*tasks)
+        except asyncio.CancelledError:
+            cancelled = True
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+        finally:
+            flush()
+            pool.close()
+        return {"checked": self.checked, "dead": self.dead, "total": self.total,
+                "cancelled": cancelled or self._cancelled.is_set()}
+
+    async def check(self, pool, limiter, url, etag=None, last_modified=None):
+        """Returns (status, error, latency_ms, etag, last_modified) for one link."""
+        start = time.perf_counter()
+        conditional = {}
+        if etag:
+            conditional["If-None-Match"] = etag
+        if last_modified:
+            conditional["If-Modified-Since"] = last_modified
+        method, current, redirects = "HEAD", url, 0
+        try:
+            while True:
+                if urlsplit(current).scheme not in ("http", "https"):
+                    return None, UNSUPPORTED, None, etag, last_modified
+                await limiter.wait()
+                status, headers = await asyncio.wait_for(
+                    self._request(pool, method, current, conditional), self.timeout)
+                if status in REDIRECT_STATUSES and headers.get("location") and redirects < MAX_REDIRECTS:
+                    current = urljoin(current, headers["location"])
+                    redirects += 1
+                    continue
+                if method == "HEAD" and status >= 400:
+                    method = "GET" # Some servers refuse or mishandle HEAD
+                    continue
+                break
+        except asyncio.TimeoutError:
+            return None, "timeout", None, etag, last_modified
+        except (CheckError, OSError, ValueError, asyncio.IncompleteReadError) as e:
+            # GET is worth one more try if only HEAD failed at the transport level
+            if method == "HEAD" and isinstance(e, (CheckError, asyncio.IncompleteReadError)):
+                return await self._retry_get(pool, limiter, current, start, etag, last_modified)
+            return None, describe_error(e), None, etag, last_modified
+        latency_ms = round((time.perf_counter() - start) * 1000)
+        if status == 304:
+            return status, None, latency_ms, etag, last_modified
+        return status, None, latency_ms, headers.get("etag"), headers.get("last-modified")
+
+    async def _retry_get(self, pool, limiter, url, start, etag, last_modified):
+        try:
+            await limiter.wait()
+            status, headers = await asyncio.wait_for(self._request(pool, "GET", url, {}), self.timeout)
+        except asyncio.TimeoutError:
+            return None, "timeout", None, etag, last_modified
+        except (CheckError, OSError, ValueError, asyncio.IncompleteReadError) as e:
+            return None, describe_error(e), None, etag, last_modified
+        latency_ms = round((time.perf_counter() - start) * 1000)
+        return status, None, latency_ms, headers.get("etag"), headers.get("last-modified")
+
+    async def _request(self, pool, method, url, extra_headers):
+        """Sends one request on a pooled connection; returns (status, lower-cased headers).
+
+        A reused keep-alive connection the server has meanwhile closed is
+        retried once on a fresh one.
+        """
+        parts = urlsplit(url)
+        scheme = parts.scheme
+        port = parts.port or (443 if scheme == "https" else 80)
+        if not parts.hostname:
+            raise ValueError("no host")
+        key = (scheme, parts.hostname, port)
+        path = (parts.path or "/") + (f"?{parts.query}" if parts.query else "")
+        host_header = parts.hostname if parts.port is None else f"{parts.hostname}:{parts.port}"
+        lines = [f"{method} {path} HTTP/1.1", f"Host: {host_header}", f"User-Agent: {USER_AGENT}",
+                 "Accept: */*", "Connection: keep-alive"]
+        lines += [f"{name}: {value}" for name, value in extra_headers.items()]
+        request = ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1", "replace")
+
+        while True:
+            reader, writer, reused = await pool.acquire(key)
+            try:
+                writer.write(request)
+                await writer.drain()
+                status, headers, reusable = await read_response(reader, method)
+            except (OSError, asyncio.IncompleteReadError, CheckError):
+                writer.close()
+                if reused:
+                    continue
+                raise
+            except BaseException:
+                writer.close()
+                raise
+            pool.release(key, (reader, writer), reusable)
+            return status, headers
+
+async def read_response(reader, method):
+    """Reads a response head (and drains a small body); returns (status, headers, reusable)."""
+    status_line = await reader.readline()
+    if not status_line:
+        raise CheckError("connection closed")
+    try:
+        version, status = status_line.decode("latin-1").split()[:2]
+        status = int(status)
+    except ValueError:
+        raise CheckError("malformed response") from None
+    if 100 <= status < 200: # Interim responses come before the real one
+        while (await reader.readline()).strip():
+            pass
+        return await read_response(reader, method)
+
+    headers = {}
+    for _ in range(MAX_HEADERS):
+        line = await reader.readline()
+        if not line.strip():
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+    else:
+        raise CheckError("too many headers")
+
+    reusable = version == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+    if method == "HEAD" or status in (204, 304):
+        return status, headers, reusable
+    if headers.get("transfer-encoding", "").lower().endswith("chunked"):
+        return status, headers, reusable and await drain_chunked(reader)
+    length = headers.get("content-length")
+    if length is not None and length.isdigit() and int(length) <= MAX_DRAINED_BODY:
+        await reader.readexactly(int(length))
+        return status, headers, reusable
+    return status, headers, False # Body too big, or runs until the connection closes
+
+async def drain_chunked(reader):
+    """Reads a chunked body; returns False (without finishing) if it passes MAX_DRAINED_BODY."""
+    drained = 0
+    while True:
+        size = int((await reader.readline()).split(b";")[0].strip() or b"0", 16)
+        if size == 0:
+            while (await reader.readline()).strip(): # trailers
+                pass
+            return True
+        drained += size
+        if drained > MAX_DRAINED_BODY:
+            return False
+        await reader.readexactly(size + 2)
+
+def describe_error(error):
+    if isinstance(error, ssl.SSLError):
+        return f"TLS error: {error.reason or error}"
+    if isinstance(error, OSError) and error.strerror:
+        return error.strerror
+    return str(error) or type(error).__name__
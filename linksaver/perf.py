@@ -0,0 +1,202 @@
+"""Timing and tracing for the hot paths: spans, percentile histograms and trace dumps.
+
+Off by default. Set LINKSAVER_PERF=1 (or press F4 in the app) to record
+every span into a latency histogram and a ring of trace events; set
+LINKSAVER_TRACE=path to write them as JSON on exit (loadable in
+chrome://tracing or Perfetto), and LINKSAVER_PROFILE=span-name to run
+cProfile over the next span of that name.
+
+While disabled, span() hands back a shared no-op context manager and
+@traced calls straight through after one attribute check.
+"""
+import functools
+import io
+import json
+import math
+import os
+import sys
+import threading
+import time
+from collections import deque
+
+BUCKETS_PER_OCTAVE = 8 # histogram resolution: bucket edges ~9% apart
+
+class Histogram:
+    """Log-bucketed latency histogram: constant memory, percentiles to within one bucket."""
+
+    def __init__(self):
+        self.buckets = {} # bucket index -> count
+        self.count = 0
+        self.total_ns = 0
+        self.max_ns = 0
+
+    def add(self, ns):
+        index = int(math.log2(ns) * BUCKETS_PER_OCTAVE) if ns > 0 else 0
+        self.buckets[index] = self.buckets.get(index, 0) + 1
+        self.count += 1
+        self.total_ns += ns
+        self.max_ns = max(self.max_ns, ns)
+
+    def percentile(self, p):
+        """Returns the p-th percentile (0-100) in nanoseconds, as its bucket's upper edge."""
+        if not self.count:
+            return 0
+        rank = math.ceil(self.count * p / 100)
+        seen = 0
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if seen >= rank:
+                return min(2 ** ((index + 1) / BUCKETS_PER_OCTAVE), self.max_ns)
+        return self.max_ns
+
+    def summary(self):
+        return {
+            "count": self.count,
+            "mean_ms": round(self.total_ns / self.count / 1e6, 3) if self.count else 0,
+            "p50_ms": round(self.percentile(50) / 1e6, 3),
+            "p90_ms": round(self.percentile(90) / 1e6, 3),
+            "p99_ms": round(self.percentile(99) / 1e6, 3),
+            "max_ms": round(self.max_ns / 1e6, 3),
+        }
+
+class _NullSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+NULL_SPAN = _NullSpan()
+
+class _Span:
+    def __init__(self, tracer, name):
+        self.tracer = tracer
+        self.name = name
+        self.profiler = None
+
+    def __enter__(self):
+        self.profiler = self.tracer._take_profiler(self.name)
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc):
+        end = time.perf_counter_ns()
+        if self.profiler is not None:
+            self.profiler.disable()
+            self.tracer._report_profile(self.name, self.profiler)
+        self.tracer.record(self.name, self.start, end)
+        return False
+
+class Tracer:
+    """Collects named spans from any thread. One shared instance: `tracer`."""
+    MAX_EVENTS = 20000
+
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.histograms = {}
+        self.events = deque(maxlen=self.MAX_EVENTS)
+        self.profile_target = None # span name to profile next
+        self.last_profile = None # (name, report text, .prof path)
+        self._epoch = time.perf_counter_ns()
+        self._lock = threading.Lock()
+
+    def span(self, name):
+        """Context manager timing its body as `name`."""
+        if not self.enabled:
+            return NULL_SPAN
+        return _Span(self, name)
+
+    def clock(self):
+        """Start time for a span that ends elsewhere (e.g. on another thread); 0 while disabled."""
+        return time.perf_counter_ns() if self.enabled else 0
+
+    def record(self, name, start, end=None):
+        """Records a span from a clock() start; ignored if tracing was off at the start."""
+        if not self.enabled or not start:
+            return
+        end = time.perf_counter_ns() if end is None else end
+        with self._lock:
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = Histogram()
+            histogram.add(end - start)
+            self.events.append((name, start, end - start, threading.current_thread().name))
+
+    def set_enabled(self, enabled):
+        self.enabled = enabled
+
+    def reset(self):
+        with self._lock:
+            self.histograms.clear()
+            self.events.clear()
+
+    def summary(self):
+        """Returns {span name: histogram summary}, sorted by name."""
+        with self._lock:
+            return {name: self.histograms[name].summary() for name in sorted(self.histograms)}
+
+    def profile_next(self, name):
+        """Runs cProfile over the next span called `name` (on whichever thread it runs)."""
+        self.profile_target = name
+
+    def dump(self, path):
+        """Writes the histograms and trace events as Chrome trace-format JSON."""
+        with self._lock:
+            events = [{"name": name, "ph": "X", "ts": (start - self._epoch) / 1000, "dur": duration / 1000,
+                       "pid": os.getpid(), "tid": thread} for name, start, duration, thread in self.events]
+        document = {"traceEvents": events, "histograms": self.summary()}
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(document, f, indent=1)
+
+    def _take_profiler(self, name):
+        if self.profile_target != name:
+            return None
+        with self._lock:
+            if self.profile_target != name:
+                return None
+            self.profile_target = None
+        import cProfile # Only when a profile is asked for; keeps it off the startup path
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            return None # Another profiler is already active
+        return profiler
+
+    def _report_profile(self, name, profiler):
+        path = f"linksaver-{name}-{time.strftime('%Y%m%d-%H%M%S')}.prof"
+        import pstats
+        out = io.StringIO()
+        stats = pstats.Stats(profiler, stream=out)
+        stats.sort_stats("cumulative").print_stats(25)
+        try:
+            stats.dump_stats(path)
+        except OSError:
+            path = None
+        self.last_profile = (name, out.getvalue(), path)
+        print(f"Profile of {name!r}" + (f" saved to {path}" if path else "") + "\n" + out.getvalue(), file=sys.stderr)
+
+def traced(name):
+    """Decorator timing every call of a function as a span called `name`."""
+    def decorate(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not tracer.enabled:
+                return fn(*args, **kwargs)
+            with _Span(tracer, name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+def dump_on_exit():
+    """Writes the trace to LINKSAVER_TRACE if set and tracing is on. Returns the path written, or None."""
+    path = os.environ.get("LINKSAVER_TRACE")
+    if not path or not tracer.histograms:
+        return None
+    tracer.dump(path)
+    return path
+
+tracer = Tracer(enabled=os.environ.get("LINKSAVER_PERF", "") not in ("", "0"))
+if os.environ.get("LINKSAVER_PROFILE"):
+    tracer.enabled = True
+    tracer.profile_next(os.environ["LINKSAVER_PROFILE"])
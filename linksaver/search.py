@@ -0,0 +1,179 @@
+"""Search term handling: FTS query building and the as-you-type result cache."""
+import re
+import sys
+import threading
+import unicodedata
+from collections import OrderedDict
+
+# SQLite's NOCASE collation and LOWER() only fold ASCII letters.
+ASCII_LOWER = str.maketrans("ABCDEFGHIJKLMNOPQRSTUVWXYZ", "abcdefghijklmnopqrstuvwxyz")
+
+# Search words that filter instead of matching text, e.g. "is:dead python".
+# "tag:NAME" words filter by tag and are kept whole in the filter set.
+FILTERS = {"is:dead": "dead"}
+TAG_PREFIX = "tag:"
+
+def is_filter(word):
+    return word in FILTERS or (word.startswith(TAG_PREFIX) and len(word) > len(TAG_PREFIX))
+
+def split_filters(search_term):
+    """Returns (search_term without filter words, set of filters: FILTERS values and "tag:NAME" words)."""
+    words = search_term.split()
+    filters = {FILTERS.get(w, w) for w in words if is_filter(w)}
+    if not filters:
+        return search_term, filters
+    return " ".join(w for w in words if not is_filter(w)), filters
+
+def normalize_tag(name):
+    """Tag names are lower-case words: "Machine Learning" -> "machine-learning". Returns "" if nothing is left."""
+    return "-".join(name.replace(",", " ").lower().split())
+
+def search_tokens(search_term):
+    """Splits a search term the way the FTS tokenizer splits indexed text."""
+    return re.findall(r"[^\W_]+", search_term.lower())
+
+def build_fts_query(search_term):
+    """Turns free text into an FTS5 MATCH expression of AND-ed prefix terms.
+
+    Returns None if the term contains nothing the tokenizer would index
+    (e.g. only punctuation), in which case callers fall back to LIKE.
+    """
+    tokens = search_tokens(search_term)
+    if not tokens:
+        return None
+    # Quote each token so FTS5 operators (AND, OR, NEAR, -) are taken literally
+    return " ".join(f'"{token}"*' for token in tokens)
+
+def fold_text(text):
+    """Lower-cases and strips diacritics like the unicode61 tokenizer does."""
+    text = text.lower()
+    if text.isascii():
+        return text
+    return "".join(c for c in unicodedata.normalize("NFKD", text) if not unicodedata.combining(c))
+
+def uses_fts(search_term, fts_enabled):
+    return fts_enabled and bool(search_tokens(search_term))
+
+def fold_row(row, fts_enabled):
+    """The (id, header, url) row's text as text_matcher() expects it."""
+    if fts_enabled:
+        return fold_text(row[1]) + "\n" + fold_text(row[2])
+    return row[1].translate(ASCII_LOWER) + "\n" + row[2].translate(ASCII_LOWER)
+
+def text_matcher(search_term, fts_enabled):
+    """Returns a predicate on fold_row() texts mirroring the store's matching of search_term.
+
+    Prefix tokens for FTS, a substring for the LIKE fallback. Filter words
+    must already be removed.
+    """
+    if uses_fts(search_term, fts_enabled):
+        # Every token must start some word of the folded header/url text
+        patterns = [re.compile(r"(?<![^\W_])" + re.escape(fold_text(token))) for token in search_tokens(search_term)]
+        return lambda text: all(p.search(text) for p in patterns)
+    needle = search_term.translate(ASCII_LOWER)
+    return lambda text: needle in text
+
+def row_matcher(search_term, fts_enabled):
+    """Returns a predicate telling whether an (id, header, url) row matches search_term."""
+    match = text_matcher(search_term, fts_enabled)
+    return lambda row: match(fold_row(row, fts_enabled))
+
+class SearchCache:
+    """LRU cache of complete search results, keyed by the list order and the normalized search term.
+
+    When a new term only extends a cached one ("git" -> "gith", or another
+    word added), its results are a subset of the cached ones, so they are
+    filtered in memory instead of queried. Filtering mirrors the store's
+    matching: prefix tokens for FTS, substrings for the LIKE fallback.
+    Entries are evicted least-recently-used first once their estimated size
+    passes max_bytes; results longer than max_rows are never cached.
+    Thread-safe, since lookups run on the query worker.
+    """
+
+    def __init__(self, fts_enabled, max_bytes=32 * 1024 * 1024, max_rows=50000):
+        self.fts_enabled = fts_enabled
+        self.max_bytes = max_bytes
+        self.max_rows = max_rows
+        self.hits = 0 # exact term found
+        self.narrowed = 0 # filtered from a shorter cached term
+        self.misses = 0
+        self._entries = OrderedDict() # (order, term) -> (rows, folded_texts, size)
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def get(self, search_term, order="header"):
+        """Returns the result rows for search_term in an order, or None if the database must be asked.
+
+        Filtered terms ("is:dead") are never cached: health checks change
+        their results without an add or delete.
+        """
+        if split_filters(search_term)[1]:
+            return None
+        with self._lock:
+            entry = self._entries.get((order, search_term))
+            if entry is not None:
+                self._entries.move_to_end((order, search_term))
+                self.hits += 1
+                return entry[0]
+            # Filtering keeps the rows' order, so narrowing works within one order
+            base = max((term for entry_order, term in self._entries
+                        if entry_order == order and self._narrows(term, search_term)), key=len, default=None)
+            if base is None:
+                self.misses += 1
+                return None
+            rows, texts, _ = self._entries[(order, base)]
+            self._entries.move_to_end((order, base))
+            keep = text_matcher(search_term, self.fts_enabled)
+            kept = [i for i, text in enumerate(texts) if keep(text)]
+            narrowed_rows = [rows[i] for i in kept]
+            self._add(narrowed_rows, [texts[i] for i in kept], (order, search_term))
+            self.narrowed += 1
+            return narrowed_rows
+
+    def put(self, search_term, rows, order="header"):
+        if len(rows) > self.max_rows or split_filters(search_term)[1]:
+            return
+        with self._lock:
+            self._add(rows, [fold_row(row, self.fts_enabled) for row in rows], (order, search_term))
+
+    def invalidate(self, orders=None):
+        """Drops the entries in the given orders, or every entry; called on any add or delete.
+
+        Recording opens only reorders the results sorted by use, so it passes those orders.
+        """
+        with self._lock:
+            if orders is None:
+                self._entries.clear()
+                self._size = 0
+                return
+            for key in [key for key in self._entries if key[0] in orders]:
+                self._size -= self._entries.pop(key)[2]
+
+    def stats(self):
+        with self._lock:
+            return {"hits": self.hits, "narrowed": self.narrowed, "misses": self.misses,
+                    "entries": len(self._entries), "bytes": self._size}
+
+    def _add(self, rows, texts, key):
+        size = sum(sys.getsizeof(text) + 150 for text in texts) # text plus the row tuple and its strings, roughly
+        if size > self.max_bytes:
+            return
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self._size -= old[2]
+        self._entries[key] = (rows, texts, size)
+        self._size += size
+        while self._size > self.max_bytes:
+            _, (_, _, evicted_size) = self._entries.popitem(last=False)
+            self._size -= evicted_size
+
+    def _narrows(self, old_term, new_term):
+        """True if every match for new_term is also a match for old_term."""
+        if uses_fts(old_term, self.fts_enabled) != uses_fts(new_term, self.fts_enabled):
+            return False
+        if uses_fts(new_term, self.fts_enabled):
+            old_tokens, new_tokens = search_tokens(old_term), search_tokens(new_term)
+            return len(new_tokens) >= len(old_tokens) and all(
+                new.startswith(old) for old, new in zip(old_tokens, new_tokens))
+        # LIKE wildcards in the term can't be mirrored in Python
+        return old_term in new_term and not any(c in new_term for c in "%_")
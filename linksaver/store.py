@@ -0,0 +1,936 @@
+"""SQLite storage for links: schema, the LinkStore data-access layer and pagers."""
+import bisect
+import contextlib
+import os
+import sqlite3
+import threading
+import time
+
+from . import fuzzy
+from .perf import traced, tracer
+from .search import ASCII_LOWER, TAG_PREFIX, build_fts_query, normalize_tag, split_filters
+from .urls import canonicalize_url, url_hash
+
+# Database location; override with the LINKSAVER_DB environment variable.
+DEFAULT_DB_PATH = os.environ.get("LINKSAVER_DB", "links.db")
+
+# Orders the link list can be shown in: name -> (sort column, direction).
+# Ties are broken by id in the same direction, so each order is a single scan
+# of its index (backwards for DESC; an index holds the rowid after its
+# column). "header" compares COLLATE NOCASE, like idx_links_header_nocase.
+ORDERS = {
+    "header": ("links.header", "ASC"), # idx_links_header_nocase
+    "added": ("links.created_at", "DESC"), # idx_links_created_at
+    "opened": ("links.last_opened_at", "DESC"), # idx_links_last_opened_at
+    "popular": ("links.open_count", "DESC"), # idx_links_open_count
+}
+USAGE_ORDERS = {"opened", "popular"} # change as links are opened (see usage.py)
+
+def order_by(order):
+    """The ORDER BY terms of one of ORDERS."""
+    column, direction = ORDERS[order]
+    collate = " COLLATE NOCASE" if order == "header" else ""
+    return f"{column}{collate} {direction}, links.id {direction}"
+
+def key_condition(order, key, before=False):
+    """Keyset condition for rows after (or before) a (sort value, id) key in an order: ([condition], params)."""
+    column, direction = ORDERS[order]
+    op = ">" if (direction == "ASC") != before else "<"
+    collate = " COLLATE NOCASE" if order == "header" else ""
+    return [f"({column}, links.id) {op} (?{collate}, ?)"], list(key)
+
+def key_arms(order, key, before=False):
+    """key_condition split in two: the rest of the key's tie group, then the rows past it.
+
+    SQLite only seeks an index on the first part of a row-value comparison,
+    so after a key inside a large tie group (every never-opened link has
+    open_count 0) the single condition scans the group up to the key. Each
+    arm here is an index seek; returns two ([conditions], params) pairs.
+    """
+    column, direction = ORDERS[order]
+    op = ">" if (direction == "ASC") != before else "<"
+    collate = " COLLATE NOCASE" if order == "header" else ""
+    return [([f"{column} = ?{collate}", f"links.id {op} ?"], [key[0], key[1]]),
+            ([f"{column} {op} ?{collate}"], [key[0]])]
+
+# Alphabetical order of the link list, the default
+LIST_ORDER = order_by("header")
+
+# FTS5 index over header and url, kept in sync with `links` by triggers.
+# unicode61 treats every non-alphanumeric character as a separator, so a URL is
+# indexed as its scheme, host labels and path parts ("github", "com", "user").
+FTS_SCHEMA = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS links_fts USING fts5(
+        header, url,
+        content='links', content_rowid='id',
+        tokenize="unicode61 remove_diacritics 2"
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS links_fts_ai AFTER INSERT ON links BEGIN
+        INSERT INTO links_fts(rowid, header, url) VALUES (new.id, new.header, new.url);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS links_fts_ad AFTER DELETE ON links BEGIN
+        INSERT INTO links_fts(links_fts, rowid, header, url) VALUES ('delete', old.id, old.header, old.url);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS links_fts_au AFTER UPDATE OF header, url ON links BEGIN
+        INSERT INTO links_fts(links_fts, rowid, header, url) VALUES ('delete', old.id, old.header, old.url);
+        INSERT INTO links_fts(rowid, header, url) VALUES (new.id, new.header, new.url);
+    END
+    """,
+]
+
+# Duplicates are detected on canonical_url through a UNIQUE index on its 64-bit
+# hash: an 8-byte integer key instead of a B-tree over the full URL text.
+# (A hash collision would need ~4 billion links to become likely.)
+LINKS_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS links (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        header TEXT NOT NULL,
+        url TEXT NOT NULL,
+        canonical_url TEXT NOT NULL,
+        url_hash INTEGER NOT NULL,
+        created_at INTEGER NOT NULL DEFAULT 0,
+        last_opened_at INTEGER NOT NULL DEFAULT 0,
+        open_count INTEGER NOT NULL DEFAULT 0
+    )
+"""
+# Columns added to `links` after its first release: name -> definition.
+# Links saved before created_at existed keep 0 and so sort as the oldest.
+LINKS_ADDED_COLUMNS = {
+    "created_at": "INTEGER NOT NULL DEFAULT 0",
+    "last_opened_at": "INTEGER NOT NULL DEFAULT 0",
+    "open_count": "INTEGER NOT NULL DEFAULT 0",
+}
+
+# Latest health check per link (see health.py). A side table rather than
+# columns on `links`, so recording a check never touches links_fts or the
+# rows the list pages through. The partial index makes the "is:dead"
+# filter and the list's dead markers an index lookup.
+HEALTH_SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS link_health (
+        link_id INTEGER PRIMARY KEY,
+        status INTEGER,
+        error TEXT,
+        latency_ms INTEGER,
+        checked_at INTEGER NOT NULL,
+        etag TEXT,
+        last_modified TEXT,
+        dead INTEGER NOT NULL DEFAULT 0
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_link_health_dead ON link_health(link_id) WHERE dead",
+]
+
+# Change log for other processes sharing the database: every insert, delete
+# and header/url update of `links`, numbered by a monotonically increasing
+# seq. Deletes and updates keep the old header/url, since the row itself is
+# gone or changed by the time a watcher reads the log. Only the newest
+# CHANGE_LOG_KEEP entries are kept; a watcher that falls further behind
+# reloads instead.
+CHANGE_LOG_KEEP = 10000
+CHANGES_SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS link_changes (
+        seq INTEGER PRIMARY KEY AUTOINCREMENT,
+        link_id INTEGER NOT NULL,
+        op TEXT NOT NULL,
+        header TEXT,
+        url TEXT
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS link_changes_ai AFTER INSERT ON links BEGIN
+        INSERT INTO link_changes (link_id, op) VALUES (new.id, 'insert');
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS link_changes_ad AFTER DELETE ON links BEGIN
+        INSERT INTO link_changes (link_id, op, header, url) VALUES (old.id, 'delete', old.header, old.url);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS link_changes_au AFTER UPDATE OF header, url ON links BEGIN
+        INSERT INTO link_changes (link_id, op, header, url) VALUES (old.id, 'update', old.header, old.url);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS link_changes_prune AFTER INSERT ON link_changes BEGIN
+        DELETE FROM link_changes WHERE seq <= new.seq - {CHANGE_LOG_KEEP};
+    END
+    """,
+]
+
+# Tags: a many-to-many link_tags table with an index each way, (link_id,
+# tag_id) for a link's tags and (tag_id, link_id) for a tag's links, both
+# covering. tags.link_count is kept up to date by triggers, so the tag list
+# and a tag-only count never run GROUP BY; a tag is dropped when its last
+# link is untagged.
+TAG_DRIVE_SHARE = 0.02 # tags on at most this share of links are looked up rather than probed (see _tag_conditions)
+TAGS_SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS tags (
+        id INTEGER PRIMARY KEY,
+        name TEXT NOT NULL UNIQUE,
+        link_count INTEGER NOT NULL DEFAULT 0
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS link_tags (
+        link_id INTEGER NOT NULL,
+        tag_id INTEGER NOT NULL,
+        PRIMARY KEY (link_id, tag_id)
+    ) WITHOUT ROWID
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_link_tags_tag ON link_tags(tag_id, link_id)",
+    "CREATE INDEX IF NOT EXISTS idx_tags_count ON tags(link_count DESC, name)",
+    """
+    CREATE TRIGGER IF NOT EXISTS link_tags_ai AFTER INSERT ON link_tags BEGIN
+        UPDATE tags SET link_count = link_count + 1 WHERE id = new.tag_id;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS link_tags_ad AFTER DELETE ON link_tags BEGIN
+        UPDATE tags SET link_count = link_count - 1 WHERE id = old.tag_id;
+        DELETE FROM tags WHERE id = old.tag_id AND link_count <= 0;
+    END
+    """,
+]
+
+def fts5_supported(conn):
+    """Returns True if the linked SQLite library was compiled with FTS5."""
+    try:
+        conn.execute("CREATE VIRTUAL TABLE temp.fts5_probe USING fts5(x)")
+        conn.execute("DROP TABLE temp.fts5_probe")
+        return True
+    except sqlite3.OperationalError:
+        return False
+
+class LinkStore:
+    """Data-access layer for links.db.
+
+    Owns one long-lived connection for the life of the app instead of opening
+    a new one per action. sqlite3 keeps the compiled form of every statement
+    issued here in its statement cache, so the fixed SQL below is parsed once.
+    Rows are returned as (id, header, url) tuples.
+    """
+
+    def __init__(self, db_path=DEFAULT_DB_PATH):
+        self.db_path = db_path
+        self.fts_enabled = False
+        self._watching = False # see watch_changes()
+        with tracer.span("store.open"):
+            self.conn = sqlite3.connect(db_path, cached_statements=256)
+            self._configure()
+            self._setup_schema()
+
+    def _configure(self):
+        # WAL lets readers run alongside a writer; NORMAL sync is durable in WAL mode
+        # except for the very last commits on power loss, and skips an fsync per insert.
+        if self.db_path != ":memory:":
+            self.conn.execute("PRAGMA journal_mode = WAL")
+        self.conn.execute("PRAGMA synchronous = NORMAL")
+        self.conn.execute("PRAGMA cache_size = -16000")   # ~16 MB page cache
+        self.conn.execute("PRAGMA mmap_size = 268435456")  # map up to 256 MB
+        self.conn.execute("PRAGMA temp_store = MEMORY")
+
+    def _setup_schema(self):
+        self.folded_duplicates = self._migrate_canonical_urls()
+        with self.conn:
+            self.conn.execute(LINKS_SCHEMA)
+            columns = {row[1] for row in self.conn.execute("PRAGMA table_info(links)")}
+            for name, definition in LINKS_ADDED_COLUMNS.items():
+                if name not in columns:
+                    self.conn.execute(f"ALTER TABLE links ADD COLUMN {name} {definition}")
+            self.conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_links_url_hash ON links(url_hash)")
+            self.conn.execute("CREATE INDEX IF NOT EXISTS idx_links_header_nocase ON links(header COLLATE NOCASE)")
+            for column in ("created_at", "last_opened_at", "open_count"):
+                self.conn.execute(f"CREATE INDEX IF NOT EXISTS idx_links_{column} ON links({column})")
+
+            self.fts_enabled = fts5_supported(self.conn)
+            if self.fts_enabled:
+                needs_backfill = self.conn.execute(
+                    "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'links_fts'"
+                ).fetchone() is None
+                old_trigger = self.conn.execute("SELECT sql FROM sqlite_master WHERE name = 'links_fts_au'").fetchone()
+                if old_trigger and "UPDATE OF" not in old_trigger[0]:
+                    # Migration: it used to fire on every update, recording an open included
+                    self.conn.execute("DROP TRIGGER links_fts_au")
+                for statement in FTS_SCHEMA:
+                    self.conn.execute(statement)
+                if needs_backfill or self.folded_duplicates:
+                    # Migration: index rows saved before the FTS table existed
+                    self.conn.execute("INSERT INTO links_fts(links_fts) VALUES ('rebuild')")
+
+            for statement in HEALTH_SCHEMA + CHANGES_SCHEMA + TAGS_SCHEMA:
+                self.conn.execute(statement)
+
+            vocabulary_empty = self.conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'fuzzy_terms'").fetchone() is None
+            for statement in fuzzy.FUZZY_SCHEMA:
+                self.conn.execute(statement)
+            if vocabulary_empty or self.folded_duplicates:
+                # Migration: build the fuzzy vocabulary for rows saved before it existed
+                fuzzy.rebuild_index(self.conn)
+
+    def _migrate_canonical_urls(self):
+        """Rebuilds a pre-canonical `links` table (UNIQUE on raw url) into LINKS_SCHEMA.
+
+        Rows whose URLs canonicalize to the same thing are folded into the
+        oldest one. Ids and the AUTOINCREMENT counter are preserved. Returns
+        the number of rows folded away.
+        """
+        columns = [row[1] for row in self.conn.execute("PRAGMA table_info(links)")]
+        if not columns or "canonical_url" in columns:
+            return 0
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            self.conn.execute(LINKS_SCHEMA.replace("IF NOT EXISTS links", "links_migrated"))
+            seen, folded = set(), 0
+            for link_id, header, url in self.conn.execute("SELECT id, header, url FROM links ORDER BY id"):
+                canonical = canonicalize_url(url)
+                key = url_hash(canonical)
+                if key in seen:
+                    folded += 1
+                    continue
+                seen.add(key)
+                self.conn.execute("INSERT INTO links_migrated (id, header, url, canonical_url, url_hash) VALUES (?, ?, ?, ?, ?)",
+                                  (link_id, header, url, canonical, key))
+            sequence = self.conn.execute("SELECT seq FROM sqlite_sequence WHERE name = 'links'").fetchone()
+            for trigger in ("links_fts_ai", "links_fts_ad", "links_fts_au"):
+                self.conn.execute(f"DROP TRIGGER IF EXISTS {trigger}") # recreated with FTS_SCHEMA
+            self.conn.execute("DROP TABLE links")
+            self.conn.execute("ALTER TABLE links_migrated RENAME TO links")
+            if sequence:
+                # Keep ids of deleted links from being reused
+                if not self.conn.execute("UPDATE sqlite_sequence SET seq = max(seq, ?) WHERE name = 'links'", sequence).rowcount:
+                    self.conn.execute("INSERT INTO sqlite_sequence (name, seq) VALUES ('links', ?)", sequence)
+            self.conn.commit()
+        except BaseException:
+            self.conn.rollback()
+            raise
+        return folded
+
+    def close(self):
+        self.conn.close()
+
+    @traced("store.add")
+    def add(self, header, url):
+        """Inserts a link and returns its id.
+
+        Raises sqlite3.IntegrityError if a link with the same canonical URL exists.
+        """
+        canonical = canonicalize_url(url)
+        with self.conn:
+            cursor = self.conn.execute(
+                "INSERT INTO links (header, url, canonical_url, url_hash, created_at) VALUES (?, ?, ?, ?, ?)",
+                (header, url, canonical, url_hash(canonical), int(time.time())))
+            fuzzy.index_links(self.conn, [(header, url)], 1)
+        return cursor.lastrowid
+
+    @traced("store.add_many")
+    def add_many(self, rows, batch_size=5000, progress=None):
+        """Bulk-inserts (header, url) pairs from any iterable, one transaction per batch.
+
+        URLs whose canonical form already exists (in the table or earlier in
+        the same import) are skipped by INSERT OR IGNORE rather than raising.
+        Returns (inserted, duplicates); progress(inserted, duplicates) is
+        called after each batch commits.
+        """
+        inserted = duplicates = 0
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= batch_size:
+                added = self._insert_batch(batch)
+                inserted += added
+                duplicates += len(batch) - added
+                batch = []
+                if progress:
+                    progress(inserted, duplicates)
+        if batch:
+            added = self._insert_batch(batch)
+            inserted += added
+            duplicates += len(batch) - added
+            if progress:
+                progress(inserted, duplicates)
+        return inserted, duplicates
+
+    def _insert_batch(self, batch):
+        rows = []
+        now = int(time.time())
+        for header, url in batch:
+            canonical = canonicalize_url(url)
+            rows.append((header, url, canonical, url_hash(canonical), now))
+        with self.conn:
+            # Take the write lock before reading seq, so no other writer can insert between the two
+            self.conn.execute("BEGIN IMMEDIATE")
+            last_id = self.conn.execute("SELECT seq FROM sqlite_sequence WHERE name = 'links'").fetchone()
+            cursor = self.conn.executemany(
+                "INSERT OR IGNORE INTO links (header, url, canonical_url, url_hash, created_at) VALUES (?, ?, ?, ?, ?)", rows)
+            # AUTOINCREMENT ids only grow, so the rows past the old maximum are the ones inserted
+            fuzzy.index_links(self.conn, self.conn.execute(
+                "SELECT header, url FROM links WHERE id > ?", (last_id[0] if last_id else 0,)), 1)
+        return cursor.rowcount
+
+    def iter_all(self):
+        """Yields every row in list order without materializing the table."""
+        yield from self.conn.execute(f"SELECT links.id, links.header, links.url FROM links ORDER BY {LIST_ORDER}")
+
+    def delete(self, link_id):
+        """Deletes a link by id. Returns True if a row was removed."""
+        return self.delete_many([link_id]) > 0
+
+    @traced("store.delete_many")
+    def delete_many(self, link_ids):
+        """Deletes links by id in one transaction. Returns how many rows were removed."""
+        deleted = 0
+        with self.conn:
+            for link_id in link_ids:
+                row = self.conn.execute("SELECT header, url FROM links WHERE id = ?", (link_id,)).fetchone()
+                if row is None:
+                    continue
+                self.conn.execute("DELETE FROM links WHERE id = ?", (link_id,))
+                self.conn.execute("DELETE FROM link_health WHERE link_id = ?", (link_id,))
+                self.conn.execute("DELETE FROM link_tags WHERE link_id = ?", (link_id,))
+                fuzzy.index_links(self.conn, [row], -1)
+                deleted += 1
+        return deleted
+
+    @traced("store.get")
+    def get(self, link_id):
+        """Returns the (id, header, url) row for link_id, or None."""
+        return self.conn.execute("SELECT id, header, url FROM links WHERE id = ?", (link_id,)).fetchone()
+
+    @traced("store.query")
+    def query(self, search_term="", order="header", limit=-1):
+        """Returns rows matching search_term (all rows if empty), at most `limit` if given.
+
+        order is one of ORDERS ("header", the list's alphabetical order, by
+        default); order="rank" sorts search results by bm25 relevance,
+        weighting header above URL matches.
+        """
+        source, conditions, params, is_fts = self._filter_sql(search_term)
+        if order == "rank":
+            terms = "bm25(links_fts, 10.0, 1.0), links.id" if is_fts else LIST_ORDER
+        else:
+            terms = order_by(order)
+        sql = f"SELECT links.id, links.header, links.url {source}{where_clause(conditions)} ORDER BY {terms} LIMIT ?"
+        return self.conn.execute(sql, params + [limit]).fetchall()
+
+    @traced("store.fuzzy_search")
+    def fuzzy_search(self, search_term, k=50):
+        """Returns the k best typo-tolerant matches for search_term, best first (see fuzzy.py)."""
+        return fuzzy.fuzzy_search(self, search_term, k)
+
+    @traced("store.count")
+    def count(self, search_term=""):
+        """Returns the number of rows matching search_term."""
+        text, filters = split_filters(search_term.strip().lower())
+        if not text and len(filters) == 1 and next(iter(filters)).startswith(TAG_PREFIX):
+            # A single tag: its maintained count, no scan
+            row = self.conn.execute("SELECT link_count FROM tags WHERE name = ?",
+                                    (next(iter(filters))[len(TAG_PREFIX):],)).fetchone()
+            return row[0] if row else 0
+        # Without ordering or text to drive it, counting is cheapest from the rarest tag's links
+        source, conditions, params, _ = self._filter_sql(search_term, tag_drive="auto" if text else "always")
+        return self.conn.execute(f"SELECT COUNT(*) {source}{where_clause(conditions)}", params).fetchone()[0]
+
+    @traced("store.page")
+    def page(self, search_term="", after=None, limit=100, skip=0, order="header"):
+        """Returns up to `limit` matching rows in one of ORDERS (by default header NOCASE, id).
+
+        Keyset pagination: `after` is the sort_key() of the row just before
+        the page, or None to start at the top; `skip` rows past that key are
+        stepped over first. Walks the order's index, so the cost depends on
+        the page size and skip, not on where the key sits.
+        """
+        sql, params, _ = self._ordered_sql("links.id, links.header, links.url", search_term, after, order)
+        return [row[:3] for row in self.conn.execute(f"{sql} LIMIT ? OFFSET ?", params + [limit, skip])]
+
+    @traced("store.anchor_keys")
+    def anchor_keys(self, search_term, after, every, limit, order="header"):
+        """Sort keys of every `every`-th row among the next `limit` matching rows past `after` (see page()).
+
+        Returns (keys, whether the walk reached the last row). Reads only ids
+        and sort values, so without a full-text term it is a walk of the
+        order's index. With one, every call would match and sort the whole
+        result again, so the rest of it is walked at once instead.
+        """
+        sql, params, is_fts = self._ordered_sql("links.id", search_term, after, order)
+        rows = self.conn.execute(f"{sql} LIMIT ?", params + [-1 if is_fts else limit])
+        keys, walked = [], 0
+        for walked, (link_id, value) in enumerate(rows, 1):
+            if walked % every == 0:
+                keys.append((value, link_id))
+        return keys, is_fts or walked < limit
+
+    def _ordered_sql(self, columns, search_term, after, order):
+        """SELECT of columns (links.id first) and then the sort value, for the rows matching
+        search_term past the `after` key in an order. Returns (sql, params, uses_fts); append LIMIT.
+        """
+        source, conditions, params, is_fts = self._filter_sql(search_term)
+        column, direction = ORDERS[order]
+        select = f"SELECT {columns}, {column} {source}"
+        if after is not None and not is_fts:
+            # Each arm seeks the order's index; the merge keeps them in order
+            collate = " COLLATE NOCASE" if order == "header" else ""
+            arms, arm_params = [], []
+            for arm_conditions, key_params in key_arms(order, after):
+                arms.append(f"{select}{where_clause(conditions + arm_conditions)}")
+                arm_params += params + key_params
+            value_column = columns.count(",") + 2 # A compound's ORDER BY names result columns
+            return (f"{' UNION ALL '.join(arms)} ORDER BY {value_column}{collate} {direction}, 1 {direction}",
+                    arm_params, False)
+        if after is not None:
+            # FTS drives the query, so the order's index isn't walked anyway
+            key_conditions, key_params = key_condition(order, after)
+            conditions, params = conditions + key_conditions, params + key_params
+        return f"{select}{where_clause(conditions)} ORDER BY {order_by(order)}", params, is_fts
+
+    def sort_key(self, row, order="header"):
+        """The (sort value, id) key of an (id, header, url) row in an order; None if the link is gone.
+
+        The alphabetical key comes from the row itself; the others are read
+        from the database.
+        """
+        if order == "header":
+            return row_key(row)
+        column = ORDERS[order][0]
+        found = self.conn.execute(f"SELECT {column} FROM links WHERE id = ?", (row[0],)).fetchone()
+        return None if found is None else (found[0], row[0])
+
+    @traced("store.position")
+    def position(self, search_term, key, order="header"):
+        """Returns how many matching rows sort before the sort_key() key."""
+        source, conditions, params, is_fts = self._filter_sql(search_term)
+        arms = [key_condition(order, key, before=True)] if is_fts else key_arms(order, key, before=True)
+        counts, count_params = [], []
+        for arm_conditions, key_params in arms:
+            counts.append(f"(SELECT COUNT(*) {source}{where_clause(conditions + arm_conditions)})")
+            count_params += params + key_params
+        return self.conn.execute(f"SELECT {' + '.join(counts)}", count_params).fetchone()[0]
+
+    @traced("store.matches")
+    def matches(self, search_term, link_id):
+        """Returns True if the link with link_id is part of search_term's results."""
+        source, conditions, params, _ = self._filter_sql(search_term, tag_drive="never")
+        sql = f"SELECT 1 {source}{where_clause(conditions + ['links.id = ?'])}"
+        return self.conn.execute(sql, params + [link_id]).fetchone() is not None
+
+    def data_version(self):
+        """Changes whenever another connection (or process) commits to the database."""
+        return self.conn.execute("PRAGMA data_version").fetchone()[0]
+
+    def change_seq(self):
+        """The seq of the newest change-log entry (0 if none)."""
+        return self.conn.execute("SELECT COALESCE(MAX(seq), 0) FROM link_changes").fetchone()[0]
+
+    @contextlib.contextmanager
+    def snapshot(self):
+        """Runs the block's reads in one read transaction, so they all see the same state.
+
+        Only TEMP tables may be written inside it (see forget_own_changes).
+        """
+        self.conn.execute("BEGIN")
+        try:
+            yield
+        except BaseException:
+            self.conn.rollback()
+            raise
+        self.conn.commit()
+
+    def watch_changes(self):
+        """Makes changes_since() skip changes made through this connection.
+
+        A TEMP trigger only fires for the connection that created it, so it can
+        record which change-log entries are this connection's own. It drops
+        entries as link_changes_prune drops theirs, so a long session with no
+        other writer keeps at most CHANGE_LOG_KEEP of them.
+        """
+        self.conn.execute("CREATE TEMP TABLE IF NOT EXISTS own_changes (seq INTEGER PRIMARY KEY)")
+        self.conn.execute("CREATE TEMP TRIGGER IF NOT EXISTS own_changes_ai AFTER INSERT ON main.link_changes BEGIN"
+                          " INSERT INTO own_changes (seq) VALUES (new.seq);"
+                          f" DELETE FROM own_changes WHERE seq <= new.seq - {CHANGE_LOG_KEEP}; END")
+        self._watching = True
+
+    def forget_own_changes(self, through_seq):
+        """Drops own-change entries up to through_seq, once everything up to it has been seen."""
+        if self._watching:
+            self.conn.execute("DELETE FROM temp.own_changes WHERE seq <= ?", (through_seq,))
+
+    @traced("store.changes_since")
+    def changes_since(self, after_seq, limit=1000):
+        """Returns (changes, last_seq) for the links other connections changed after after_seq.
+
+        changes maps link_id -> (old_row, new_row): the (id, header, url) row
+        as of after_seq and as of now, either None if the link didn't exist.
+        changes is None if the log no longer reaches back to after_seq or
+        holds more than `limit` changes, in which case a reload is cheaper.
+        """
+        oldest = self.conn.execute("SELECT MIN(seq) FROM link_changes").fetchone()[0]
+        last_seq = self.change_seq()
+        if oldest is not None and oldest > after_seq + 1:
+            return None, last_seq
+        own_filter = " AND c.seq NOT IN (SELECT seq FROM temp.own_changes)" if self._watching else ""
+        rows = self.conn.execute(
+            "SELECT c.link_id, c.op, c.header, c.url, links.header, links.url"
+            " FROM link_changes c LEFT JOIN links ON links.id = c.link_id"
+            f" WHERE c.seq > ?{own_filter} ORDER BY c.seq LIMIT ?", (after_seq, limit + 1)).fetchall()
+        if len(rows) > limit:
+            return None, last_seq
+        changes = {}
+        for link_id, op, old_header, old_url, header, url in rows:
+            if link_id not in changes: # The first entry tells what the link was before
+                old_row = None if op == "insert" else (link_id, old_header, old_url)
+                new_row = None if header is None else (link_id, header, url)
+                changes[link_id] = (old_row, new_row)
+        self.forget_own_changes(last_seq)
+        return changes, last_seq
+
+    @traced("store.record_usage")
+    def record_usage(self, usage):
+        """Adds (link_id, times opened, last opened at) rows to the links' usage, in one transaction."""
+        with self.conn:
+            self.conn.executemany(
+                "UPDATE links SET open_count = open_count + ?, last_opened_at = MAX(last_opened_at, ?) WHERE id = ?",
+                [(count, opened_at, link_id) for link_id, count, opened_at in usage])
+
+    def tags(self, limit=-1):
+        """Returns (name, link_count) pairs, most used first."""
+        return self.conn.execute("SELECT name, link_count FROM tags ORDER BY link_count DESC, name LIMIT ?",
+                                 (limit,)).fetchall()
+
+    def tags_of(self, link_id):
+        """Returns the names of a link's tags, alphabetically."""
+        return [row[0] for row in self.conn.execute(
+            "SELECT tags.name FROM link_tags JOIN tags ON tags.id = link_tags.tag_id WHERE link_tags.link_id = ?"
+            " ORDER BY tags.name", (link_id,))]
+
+    @traced("store.tag_links")
+    def tag_links(self, link_ids, add=(), remove=()):
+        """Adds and removes tags on the given links in one transaction.
+
+        Tag names are normalized (see normalize_tag); new tags are created.
+        Returns the number of tag assignments added plus removed.
+        """
+        add, remove = self._tag_names(add), self._tag_names(remove)
+        link_ids = list(link_ids)
+        changed = 0
+        with self.conn:
+            self._create_tags(add)
+            for name in add:
+                changed += self.conn.executemany(
+                    "INSERT OR IGNORE INTO link_tags (link_id, tag_id)"
+                    " SELECT links.id, tags.id FROM links, tags WHERE links.id = ? AND tags.name = ?",
+                    [(link_id, name) for link_id in link_ids]).rowcount
+            for name in remove:
+                changed += self.conn.executemany(
+                    "DELETE FROM link_tags WHERE link_id = ? AND tag_id = (SELECT id FROM tags WHERE name = ?)",
+                    [(link_id, name) for link_id in link_ids]).rowcount
+            self._drop_unused_tags(add)
+        return changed
+
+    @traced("store.tag_search")
+    def tag_search(self, search_term, add=(), remove=()):
+        """Like tag_links, for every link matching search_term; one statement per tag."""
+        add, remove = self._tag_names(add), self._tag_names(remove)
+        source, conditions, params, _ = self._filter_sql(search_term)
+        matching = f"SELECT links.id {source}{where_clause(conditions)}"
+        changed = 0
+        with self.conn:
+            self._create_tags(add)
+            for name in add:
+                changed += self.conn.execute(
+                    f"INSERT OR IGNORE INTO link_tags (link_id, tag_id) SELECT id, (SELECT id FROM tags WHERE name = ?)"
+                    f" FROM ({matching})", [name] + params).rowcount
+            for name in remove:
+                changed += self.conn.execute(
+                    f"DELETE FROM link_tags WHERE tag_id = (SELECT id FROM tags WHERE name = ?) AND link_id IN ({matching})",
+                    [name] + params).rowcount
+            self._drop_unused_tags(add)
+        return changed
+
+    def _tag_names(self, names):
+        names = {normalize_tag(name) for name in names}
+        names.discard("")
+        return sorted(names)
+
+    def _create_tags(self, names):
+        self.conn.executemany("INSERT OR IGNORE INTO tags (name) VALUES (?)", [(name,) for name in names])
+
+    def _drop_unused_tags(self, names):
+        # A tag created for links that turned out not to exist
+        self.conn.executemany("DELETE FROM tags WHERE name = ? AND link_count = 0", [(name,) for name in names])
+
+    @traced("store.dead_ids")
+    def dead_ids(self, link_ids):
+        """Returns the subset of link_ids whose last health check found them dead."""
+        link_ids = list(link_ids)
+        if not link_ids:
+            return set()
+        placeholders = ",".join("?" * len(link_ids))
+        return {row[0] for row in self.conn.execute(
+            f"SELECT link_id FROM link_health WHERE dead AND link_id IN ({placeholders})", link_ids)}
+
+    def health_pending(self, checked_before):
+        """Number of links never checked, or last checked before the checked_before timestamp."""
+        return self.conn.execute(
+            "SELECT COUNT(*) FROM links LEFT JOIN link_health ON link_health.link_id = links.id"
+            " WHERE link_health.checked_at IS NULL OR link_health.checked_at < ?", (checked_before,)).fetchone()[0]
+
+    def health_batch(self, after_id, checked_before, limit):
+        """Next links due a check, in id order: (id, url, etag, last_modified) rows with id > after_id."""
+        return self.conn.execute(
+            "SELECT links.id, links.url, link_health.etag, link_health.last_modified"
+            " FROM links LEFT JOIN link_health ON link_health.link_id = links.id"
+            " WHERE links.id > ? AND (link_health.checked_at IS NULL OR link_health.checked_at < ?)"
+            " ORDER BY links.id LIMIT ?", (after_id, checked_before, limit)).fetchall()
+
+    def save_health(self, results):
+        """Stores (link_id, status, error, latency_ms, checked_at, etag, last_modified, dead) rows.
+
+        Links deleted while they were being checked are left out.
+        """
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO link_health (link_id, status, error, latency_ms, checked_at, etag, last_modified, dead)"
+                " SELECT ?, ?, ?, ?, ?, ?, ?, ? WHERE EXISTS (SELECT 1 FROM links WHERE id = ?)",
+                [row + (row[0],) for row in results])
+
+    def _filter_sql(self, search_term, tag_drive="auto"):
+        """Returns (FROM clause, WHERE conditions, params, uses_fts) for a search term.
+
+        tag_drive is passed on to _tag_conditions.
+        """
+        search_term, filters = split_filters(search_term.strip().lower())
+        conditions = []
+        params = []
+        if "dead" in filters:
+            conditions.append("links.id IN (SELECT link_id FROM link_health WHERE dead)")
+        tag_names = sorted(f[len(TAG_PREFIX):] for f in filters if f.startswith(TAG_PREFIX))
+        if tag_names:
+            tag_conditions, tag_params = self._tag_conditions(tag_names, tag_drive)
+            conditions += tag_conditions
+            params += tag_params
+        if not search_term:
+            return "FROM links", conditions, params, False
+        fts_query = build_fts_query(search_term) if self.fts_enabled else None
+        if fts_query:
+            return ("FROM links_fts JOIN links ON links.id = links_fts.rowid",
+                    ["links_fts MATCH ?"] + conditions, [fts_query] + params, True)
+        # Fallback for SQLite builds without FTS5 (and punctuation-only terms)
+        like_term = f"%{search_term}%"
+        return ("FROM links", ["(LOWER(links.header) LIKE ? OR LOWER(links.url) LIKE ?)"] + conditions,
+                [like_term, like_term] + params, False)
+
+    def _tag_conditions(self, names, drive):
+        """WHERE conditions for links having all the named tags.
+
+        The tags' maintained counts pick the plan: the rarest tag's links are
+        looked up through idx_link_tags_tag and drive the query, and the
+        other tags are probed per row through the link_tags primary key.
+        With drive="auto" the rarest tag only drives if it is on at most
+        TAG_DRIVE_SHARE of the links, so paging in list order through a
+        common tag stops after a page instead of collecting the whole tag
+        first; "always" suits unordered counts and "never" single-row checks.
+        """
+        placeholders = ",".join("?" * len(names))
+        found = self.conn.execute(
+            f"SELECT id, link_count FROM tags WHERE name IN ({placeholders}) ORDER BY link_count", names).fetchall()
+        if len(found) < len(names):
+            return ["0"], [] # An unknown tag matches nothing
+        if drive == "auto":
+            # The AUTOINCREMENT counter is a free upper bound on the number of links
+            last_id = self.conn.execute("SELECT seq FROM sqlite_sequence WHERE name = 'links'").fetchone()
+            drive = "always" if found[0][1] <= (last_id[0] if last_id else 0) * TAG_DRIVE_SHARE else "never"
+        conditions, params = [], []
+        for i, (tag_id, link_count) in enumerate(found):
+            if i == 0 and drive == "always":
+                conditions.append("links.id IN (SELECT link_id FROM link_tags WHERE tag_id = ?)")
+            else:
+                conditions.append("EXISTS (SELECT 1 FROM link_tags WHERE link_id = links.id AND tag_id = ?)")
+            params.append(tag_id)
+        return conditions, params
+
+class LinkPager:
+    """Random access by offset into the ordered result of one search.
+
+    Keeps a sparse set of anchors (offset -> key of the row before it)
+    recorded as pages are fetched, so jumping to an offset only has to skip
+    from the nearest anchor instead of holding every row in Python. The GUI
+    reads pages on its query worker and patches in changes on the Tk thread,
+    so the anchors are guarded by a lock.
+    """
+    MAX_ANCHORS = 4096
+    ANCHOR_EVERY = 1000 # seeded anchors are this many rows apart; see seed_anchors
+    ranked = False # rows are in list order
+
+    def __init__(self, store, search_term="", total=None, order="header"):
+        self.store = store
+        self.search_term = search_term
+        self.order = order
+        self.total = store.count(search_term) if total is None else total
+        self._anchor_offsets = [0] # sorted, for bisect
+        self._anchor_keys = {0: None}
+        self._lock = threading.Lock()
+        self._version = 0 # bumped per note_insert/note_delete; offsets read before one are off
+        self._seeded = (0, None) # (offset, key) seed_anchors has got to
+
+    def rows(self, offset, limit):
+        """Returns the rows at [offset, offset + limit)."""
+        with self._lock:
+            offset = max(0, min(offset, self.total))
+            anchor = self._anchor_offsets[bisect.bisect_right(self._anchor_offsets, offset) - 1]
+            after, version = self._anchor_keys[anchor], self._version
+        rows = self.store.page(self.search_term, after, limit, skip=offset - anchor, order=self.order)
+        if rows:
+            key = self.store.sort_key(rows[-1], self.order)
+            with self._lock:
+                if key is not None and version == self._version:
+                    self._add_anchor(offset + len(rows), key)
+        return rows
+
+    def seed_anchors(self, rows=50000):
+        """Adds an anchor every ANCHOR_EVERY rows over the next `rows` rows not seeded yet.
+
+        Returns whether there is more to seed. Run to the end (in chunks, so
+        page reads can go in between), it leaves every jump fewer than
+        ANCHOR_EVERY rows to skip. Stops if a change is patched in meanwhile,
+        as the offsets it counted from are off by then.
+        """
+        with self._lock:
+            (offset, after), version = self._seeded, self._version
+        keys, finished = self.store.anchor_keys(self.search_term, after, self.ANCHOR_EVERY, rows, self.order)
+        with self._lock:
+            if version != self._version:
+                return False
+            for key in keys:
+                offset += self.ANCHOR_EVERY
+                self._add_anchor(offset, key)
+            if keys:
+                self._seeded = (offset, keys[-1])
+        return not finished
+
+    @property
+    def patchable(self):
+        """Whether note_insert/note_delete can place a change.
+
+        Only in alphabetical order: the other orders' sort values aren't in
+        the rows, and a deleted row's can't be looked up any more.
+        """
+        return self.order == "header"
+
+    def offset_of(self, row):
+        """Returns the offset of a row that matches this pager's search."""
+        key = self.store.sort_key(row, self.order)
+        return 0 if key is None else self.store.position(self.search_term, key, self.order)
+
+    def contains(self, link_id):
+        return self.store.matches(self.search_term, link_id)
+
+    def note_insert(self, row):
+        """Accounts for a row inserted into the result set without re-counting it (if patchable)."""
+        self._shift_anchors(row, 1)
+
+    def note_delete(self, row):
+        """Accounts for a row removed from the result set without re-counting it."""
+        self._shift_anchors(row, -1)
+
+    def _shift_anchors(self, row, delta):
+        # An anchor's key is the last row before its offset, so only anchors whose
+        # key sorts at or after the changed row move (a deleted key still bounds).
+        row_sort_key = nocase_key(row_key(row))
+        with self._lock:
+            self._version += 1
+            self.total += delta
+            shifted = {}
+            for offset, key in self._anchor_keys.items():
+                if key is not None and nocase_key(key) >= row_sort_key:
+                    offset += delta
+                shifted.setdefault(offset, key)
+            self._anchor_keys = shifted
+            self._anchor_offsets = sorted(shifted)
+
+    def _add_anchor(self, offset, key):
+        if offset in self._anchor_keys:
+            return
+        if len(self._anchor_offsets) >= self.MAX_ANCHORS:
+            # Thin out evenly rather than growing without bound
+            self._anchor_offsets = self._anchor_offsets[::2]
+            self._anchor_keys = {o: self._anchor_keys[o] for o in self._anchor_offsets}
+        bisect.insort(self._anchor_offsets, offset)
+        self._anchor_keys[offset] = key
+
+class ListPager:
+    """LinkPager interface over a result list already held in memory (see SearchCache)."""
+    ranked = False
+
+    def __init__(self, store, search_term, rows, order="header"):
+        self.store = store
+        self.search_term = search_term
+        self.order = order
+        self._rows = rows
+
+    @property
+    def patchable(self):
+        return self.order == "header"
+
+    @property
+    def total(self):
+        return len(self._rows)
+
+    def rows(self, offset, limit):
+        offset = max(0, offset)
+        return self._rows[offset:offset + limit]
+
+    def offset_of(self, row):
+        if self.order != "header":
+            return next((i for i, r in enumerate(self._rows) if r[0] == row[0]), len(self._rows))
+        return bisect.bisect_left(self._rows, nocase_key(row_key(row)), key=lambda r: nocase_key(row_key(r)))
+
+    def contains(self, link_id):
+        return self.store.matches(self.search_term, link_id)
+
+    def note_insert(self, row):
+        self._rows.insert(self.offset_of(row), row)
+
+    def note_delete(self, row):
+        offset = self.offset_of(row)
+        if offset < len(self._rows) and self._rows[offset][0] == row[0]:
+            del self._rows[offset]
+
+class RankedPager(ListPager):
+    """ListPager over fuzzy results, which are in score order rather than list order.
+
+    A change can't be placed without re-scoring, so callers reload instead
+    of calling note_insert/note_delete.
+    """
+    ranked = True
+    patchable = False
+
+    def offset_of(self, row):
+        return next((i for i, r in enumerate(self._rows) if r[0] == row[0]), len(self._rows))
+
+    def contains(self, link_id):
+        return any(r[0] == link_id for r in self._rows)
+
+def row_key(row):
+    """The (header, id) sort key of a (id, header, url) row."""
+    return (row[1], row[0])
+
+def nocase_key(key):
+    """Python equivalent of comparing a (header, id) key with COLLATE NOCASE.
+
+    NOCASE only folds ASCII letters, and comparing str code points matches
+    SQLite's comparison of the UTF-8 bytes.
+    """
+    return (key[0].translate(ASCII_LOWER), key[1])
+
+def where_clause(conditions):
+    return " WHERE " + " AND ".join(conditions) if conditions else ""
@@ -0,0 +1,83 @@
+"""URL clean-up applied before links are stored, and the canonical form used for dedup."""
+import hashlib
+import re
+from urllib.parse import urlsplit, urlunsplit
+
+def normalize_url(url):
+    """Adds https:// to URLs typed without a scheme."""
+    url = url.strip()
+    if not url.startswith(('http://', 'https://')) and "://" not in url:
+        url = 'https://' + url
+    return url
+
+# A leading "scheme:", but not "host:port" (localhost:8000/docs)
+SCHEME = re.compile(r"([A-Za-z][A-Za-z0-9+.-]*):(?!\d+(?:[/?#]|$))")
+WEB_SCHEMES = ("http", "https")
+
+def is_web_url(url):
+    """False for URLs with a scheme other than http(s): bookmarklets (javascript:), place:, mailto:, file:...
+
+    URLs without a scheme count as web URLs, since normalize_url adds https:// to them.
+    """
+    match = SCHEME.match(url.strip())
+    return match is None or match.group(1).lower() in WEB_SCHEMES
+
+DEFAULT_PORTS = {"http": 80, "https": 443, "ftp": 21}
+
+# Query parameters that only track where a click came from
+TRACKING_PARAMS = {"fbclid", "gclid", "dclid", "gbraid", "wbraid", "msclkid", "yclid", "mc_cid", "mc_eid",
+                   "igshid", "_ga", "_gl", "_hsenc", "_hsmi", "mkt_tok", "oly_anon_id", "oly_enc_id", "vero_id"}
+TRACKING_PREFIXES = ("utm_",)
+
+UNRESERVED = frozenset("ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789-._~")
+PERCENT_ESCAPE = re.compile(r"%([0-9A-Fa-f]{2})")
+
+def _normalize_escapes(text):
+    """Decodes percent-escapes of unreserved characters and upper-cases the rest (RFC 3986 6.2.2)."""
+    def fix(match):
+        char = chr(int(match.group(1), 16))
+        return char if char in UNRESERVED else "%" + match.group(1).upper()
+    return PERCENT_ESCAPE.sub(fix, text)
+
+def _is_tracking_param(pair):
+    name = pair.split("=", 1)[0].lower()
+    return name in TRACKING_PARAMS or name.startswith(TRACKING_PREFIXES)
+
+def canonicalize_url(url):
+    """Returns the form two URLs share when they point at the same page.
+
+    Lower-cases the scheme and host, IDNA-encodes international hosts, drops
+    default ports, fragments, tracking parameters and trailing slashes, and
+    normalizes percent-escapes. Query parameter order is kept, since some
+    sites give it meaning.
+    """
+    url = normalize_url(url)
+    try:
+        parts = urlsplit(url)
+        port = parts.port
+    except ValueError:
+        return url # Not parseable as a URL; dedup on the text itself
+
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or "").rstrip(".")
+    try:
+        host = host.encode("idna").decode("ascii")
+    except UnicodeError:
+        pass
+    if ":" in host:
+        host = f"[{host}]" # IPv6 literal
+    netloc = host
+    if port is not None and DEFAULT_PORTS.get(scheme) != port:
+        netloc += f":{port}"
+    if parts.username is not None:
+        userinfo = parts.username + (f":{parts.password}" if parts.password is not None else "")
+        netloc = f"{userinfo}@{netloc}"
+
+    path = _normalize_escapes(parts.path).rstrip("/") or "/"
+    query = "&".join(p for p in parts.query.split("&") if p and not _is_tracking_param(p))
+    return urlunsplit((scheme, netloc, path, _normalize_escapes(query), ""))
+
+def url_hash(canonical_url):
+    """Signed 64-bit hash of a canonical URL, the key of the dedup index."""
+    digest = hashlib.blake2b(canonical_url.encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "big", signed=True)
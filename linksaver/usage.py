@@ -0,0 +1,45 @@
+"""Write-behind recording of link opens, for the "recently opened" and "most opened" orders.
+
+Opening or copying a link only updates a dict in memory; flush() later
+writes everything recorded since the last flush in one transaction (one
+UPDATE per link, however often it was opened), so a click never waits on
+the database.
+"""
+import threading
+import time
+
+class UsageBuffer:
+    """Pending opens per link, merged until flushed. Thread-safe."""
+
+    def __init__(self):
+        self._pending = {} # link_id -> (times opened, last opened at)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._pending)
+
+    def record(self, link_id, opened_at=None):
+        opened_at = int(time.time()) if opened_at is None else opened_at
+        with self._lock:
+            count, last = self._pending.get(link_id, (0, 0))
+            self._pending[link_id] = (count + 1, max(last, opened_at))
+
+    def flush(self, store):
+        """Writes the pending opens through store (on the thread that owns it). Returns how many links were updated.
+
+        If the write fails the opens are kept for the next flush.
+        """
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return 0
+        try:
+            store.record_usage([(link_id, count, last) for link_id, (count, last) in pending.items()])
+        except BaseException:
+            with self._lock:
+                for link_id, (count, last) in pending.items():
+                    newer_count, newer_last = self._pending.get(link_id, (0, 0))
+                    self._pending[link_id] = (count + newer_count, max(last, newer_last))
+            raise
+        return len(pending)
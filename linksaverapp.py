@@ -1,9 +1,24 @@
+import time
+STARTED_NS = time.perf_counter_ns() # Startup is timed from here (see finish_startup)
+
 import tkinter as tk
-from tkinter import messagebox, font
+from tkinter import messagebox, font, filedialog, simpledialog
 import sqlite3
 import webbrowser
-import time
+import json
+import os
 import re # Import regex for robust URL extraction
+import bisect
+import queue
+import threading
+import sys
+
+from linksaver import (DEFAULT_DB_PATH, LinkStore, LinkPager, ListPager, RankedPager, SearchCache, format_link_row,
+                       normalize_url, nocase_key, row_key)
+from linksaver.search import TAG_PREFIX, row_matcher, split_filters
+from linksaver.store import USAGE_ORDERS
+from linksaver.usage import UsageBuffer
+from linksaver.perf import dump_on_exit, tracer
 
 # VS Code inspired color theme (Keep existing)
 COLORS = {
@@ -23,23 +38,101 @@ COLORS = {
     "add_flash": "#2a6041", # Dark green flash for add
 }
 
-# --- Global dictionary to map listbox index to full link data ---
-# Stores { listbox_index: (db_id, header, full_url) }
-link_data_map = {}
-
-# --- Database Operations ---
-def setup_db():
-    # Use 'with' for automatic connection management
-    with sqlite3.connect("links.db") as conn:
-        cursor = conn.cursor()
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS links (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                header TEXT NOT NULL,
-                url TEXT NOT NULL UNIQUE
-            )
-        """)
-        conn.commit()
+# --- Background Queries ---
+class QueryExecutor:
+    """Runs store operations on a worker thread so SQL never blocks the Tk mainloop.
+
+    The worker opens its own LinkStore (WAL lets it read and write alongside
+    the UI thread's connection), so migrating an old database doesn't block
+    the Tk thread; jobs submitted meanwhile wait for it. Jobs run strictly in submission order and
+    their callbacks are delivered in the same order on the Tk thread, by
+    polling a result queue with root.after, so a search result and an
+    add/delete that raced it are always applied in the order they hit the
+    database. A running "search" job can be cancelled with interrupt_search().
+    """
+    POLL_MS = 15
+
+    def __init__(self, root, db_path):
+        self.root = root
+        self.jobs = queue.Queue()
+        self.results = queue.Queue()
+        self.pending = 0 # only touched on the Tk thread
+        self._worker_conn = None
+        self._running_kind = None
+        self._lock = threading.Lock() # guards _running_kind against interrupt_search()
+        self.thread = threading.Thread(target=self._run, args=(db_path,), name="link-queries", daemon=True)
+        self.thread.start()
+
+    def submit(self, job, on_done=None, on_error=None, kind="write"):
+        """Queues job(store); on_done(result) or on_error(exc) is then called on the Tk thread."""
+        self.jobs.put((job, on_done, on_error, kind))
+        self.pending += 1
+        if self.pending == 1:
+            self.root.after(self.POLL_MS, self._poll)
+
+    def report(self, callback, value):
+        """Called from a job on the worker: runs callback(value) on the Tk thread (e.g. progress)."""
+        self.results.put((callback, value, False))
+
+    def interrupt_search(self):
+        """Aborts the search query currently running on the worker, if any."""
+        with self._lock:
+            if self._running_kind == "search":
+                self._worker_conn.interrupt()
+
+    def stop(self):
+        self.jobs.put(None)
+        self.thread.join(timeout=2)
+
+    def _run(self, db_path):
+        try:
+            worker_store = LinkStore(db_path)
+            worker_store.watch_changes() # Our own writes are patched in directly; see poll_changes
+            self._worker_conn = worker_store.conn
+            open_error = None
+        except Exception as e: # Every job then fails with it
+            worker_store, open_error = None, e
+        while True:
+            item = self.jobs.get()
+            if item is None:
+                break
+            job, on_done, on_error, kind = item
+            with self._lock:
+                self._running_kind = kind
+            try:
+                if open_error is not None:
+                    raise open_error
+                outcome = (on_done, job(worker_store), True)
+            except Exception as e:
+                outcome = (on_error, e, True)
+            with self._lock:
+                self._running_kind = None
+            self.results.put(outcome)
+        if worker_store is not None:
+            worker_store.close()
+
+    def _poll(self):
+        try:
+            while True:
+                try:
+                    callback, value, finished = self.results.get_nowait()
+                except queue.Empty:
+                    break
+                if finished:
+                    self.pending -= 1
+                if callback:
+                    callback(value)
+        finally:
+            # Even if a callback raised: the results still to come need the poll
+            if self.pending:
+                self.root.after(self.POLL_MS, self._poll)
+
+def backend_ready():
+    """False, with a note in the status bar, while start_backend is still opening the database."""
+    if executor is None:
+        set_status("Still opening the database…", COLORS["fg"])
+        return False
+    return True
 
 def add_link():
     header = header_entry.get().strip()
@@ -48,44 +141,48 @@ def add_link():
     if not header or not url:
         messagebox.showwarning("Input Error", "Both Header and URL fields are required!", parent=root)
         return
+    if not backend_ready():
+        return # The entries keep the text, so it can be added once the database is open
 
-    if not url.startswith(('http://', 'https://')):
-        if "://" not in url:
-             url = 'https://' + url
-        else:
-             pass
-
-    try:
-        with sqlite3.connect("links.db") as conn:
-            cursor = conn.cursor()
-            cursor.execute("INSERT INTO links (header, url) VALUES (?, ?)", (header, url))
-            conn.commit()
+    url = normalize_url(url)
+    pager = link_list.pager
+    started = tracer.clock()
 
+    def on_added(result):
+        link_id, listed = result
         flash_widget_bg(header_entry, COLORS["add_flash"], COLORS["entry_bg"])
         flash_widget_bg(url_entry, COLORS["add_flash"], COLORS["entry_bg"])
 
         header_entry.delete(0, tk.END)
         url_entry.delete(0, tk.END)
         set_status("Link added successfully!", COLORS["status_ok"])
-        load_links()
+        if pager is not None and (link_list.pager is not pager or not pager.patchable):
+            load_links() # A newer list, fuzzy results (re-scored) or another order (re-read)
+        elif listed:
+            link_list.insert_row((link_id, header, url))
         header_entry.focus_set()
+        tracer.record("add_link.total", started)
+
+    def on_error(e):
+        if isinstance(e, sqlite3.IntegrityError):
+            messagebox.showerror("Database Error", f"The URL '{url}' already exists.", parent=root)
+            flash_widget_bg(url_entry, COLORS["status_warn"], COLORS["entry_bg"])
+        else:
+            messagebox.showerror("Database Error", f"An error occurred: {e}", parent=root)
+            set_status(f"Error adding link: {e}", COLORS["status_warn"])
 
-    except sqlite3.IntegrityError:
-         messagebox.showerror("Database Error", f"The URL '{url}' already exists.", parent=root)
-         flash_widget_bg(url_entry, COLORS["status_warn"], COLORS["entry_bg"])
-    except Exception as e:
-        messagebox.showerror("Database Error", f"An error occurred: {e}", parent=root)
-        set_status(f"Error adding link: {e}", COLORS["status_warn"])
+    def job(s):
+        link_id = s.add(header, url)
+        search_cache.invalidate()
+        return link_id, pager is not None and pager.patchable and pager.contains(link_id)
+
+    executor.submit(job, on_added, on_error)
 
 # --- Core Link Actions ---
 
 def get_selected_link_data():
-    """Helper to get the full data for the selected listbox item."""
-    selected_indices = listbox.curselection()
-    if not selected_indices:
-        return None # Nothing selected
-    selected_index = selected_indices[0]
-    return link_data_map.get(selected_index) # Returns (id, header, url) or None
+    """Helper to get the full data for the selected link, even if it is scrolled out of view."""
+    return link_list.selected_row() # Returns (id, header, url) or None
 
 def open_link(event=None):
     """Opens the *full* URL of the selected link."""
@@ -93,24 +190,27 @@ def open_link(event=None):
 
     if link_data:
         link_id, header, full_url = link_data
-        selected_index = listbox.curselection()[0] # We know it exists here
+        selected_index = link_list.selected_index() # None if scrolled out of view
         try:
             # Visual feedback
-            original_bg = listbox.cget('selectbackground')
-            original_fg = listbox.cget('selectforeground')
-            listbox.itemconfig(selected_index, {'background': COLORS["accent"], 'foreground': COLORS["button_fg"]})
-            root.update_idletasks()
-            root.after(250, lambda idx=selected_index, bg=original_bg, fg=original_fg: listbox.itemconfig(idx, {'background': bg, 'foreground': fg}))
+            if selected_index is not None:
+                original_bg = listbox.cget('selectbackground')
+                original_fg = listbox.cget('selectforeground')
+                listbox.itemconfig(selected_index, {'background': COLORS["accent"], 'foreground': COLORS["button_fg"]})
+                root.update_idletasks()
+                root.after(250, lambda idx=selected_index, bg=original_bg, fg=original_fg: listbox.itemconfig(idx, {'background': bg, 'foreground': fg}))
 
             # Open the FULL URL
             webbrowser.open_new_tab(full_url)
+            record_usage(link_id)
             set_status(f"Opening: {full_url[:60]}...", COLORS["status_ok"])
 
         except Exception as e:
             messagebox.showerror("Error", f"Could not open link:\n{full_url}\n\nError: {e}", parent=root)
             set_status(f"Error opening link: {e}", COLORS["status_warn"])
             # Revert colors on error
-            listbox.itemconfig(selected_index, {'background': listbox.cget('selectbackground'), 'foreground': listbox.cget('selectforeground')})
+            if selected_index is not None:
+                listbox.itemconfig(selected_index, {'background': listbox.cget('selectbackground'), 'foreground': listbox.cget('selectforeground')})
     else:
         # Only show warning if triggered by event (not internal call)
         if event:
@@ -127,9 +227,11 @@ def copy_link():
             root.clipboard_clear()
             root.clipboard_append(full_url)
             set_status(f"Copied URL to clipboard!", COLORS["status_ok"])
+            record_usage(link_id)
             # Optional: visual feedback on the list item
-            selected_index = listbox.curselection()[0]
-            flash_widget_bg(listbox, COLORS["accent"], listbox.cget('selectbackground'), index=selected_index) # Flash selection bg
+            selected_index = link_list.selected_index()
+            if selected_index is not None:
+                flash_widget_bg(listbox, COLORS["accent"], listbox.cget('selectbackground'), index=selected_index) # Flash selection bg
 
         except Exception as e:
             messagebox.showerror("Clipboard Error", f"Could not copy URL to clipboard:\n{e}", parent=root)
@@ -144,15 +246,14 @@ def delete_link():
 
     if link_data:
         link_id, header, full_url = link_data
-        selected_index = listbox.curselection()[0]
-        item_text = listbox.get(selected_index) # Get display text for confirmation
+        selected_index = link_list.selected_index()
+        item_text = format_link_row(link_data) # Display text for confirmation
 
         if messagebox.askyesno("Confirm Delete", f"Are you sure you want to delete this link?\n\n{item_text.strip()}", parent=root):
             # Animation for deletion
-            original_bg = listbox.itemcget(selected_index, 'background')
-            original_fg = listbox.itemcget(selected_index, 'foreground')
-            listbox.itemconfig(selected_index, {'background': COLORS["delete_flash"], 'foreground': COLORS["button_fg"]})
-            root.update_idletasks()
+            if selected_index is not None:
+                listbox.itemconfig(selected_index, {'background': COLORS["delete_flash"], 'foreground': COLORS["button_fg"]})
+                root.update_idletasks()
             # Perform delete using the actual ID or URL after delay
             root.after(200, lambda db_id=link_id: perform_delete(db_id)) # Delete by ID is safer
         else:
@@ -164,96 +265,899 @@ def delete_link():
 # Changed perform_delete to accept ID for reliability
 def perform_delete(link_id_to_delete):
     """Performs the actual database deletion by ID."""
-    try:
-        with sqlite3.connect("links.db") as conn:
-            cursor = conn.cursor()
-            cursor.execute("DELETE FROM links WHERE id = ?", (link_id_to_delete,))
-            conn.commit()
-            if cursor.rowcount > 0:
-                set_status("Link deleted successfully!", COLORS["status_ok"])
-            else:
-                # This case might happen if the item was deleted externally between selection and confirmation
-                set_status("Link not found for deletion.", COLORS["status_warn"])
-    except Exception as e:
+    pager = link_list.pager
+    search_term = pager.search_term if pager else ""
+    started = tracer.clock()
+
+    def job(s):
+        row = s.get(link_id_to_delete)
+        # Membership can only be checked while the row still exists
+        listed = row is not None and s.matches(search_term, link_id_to_delete)
+        deleted = s.delete(link_id_to_delete)
+        search_cache.invalidate()
+        return row, listed, deleted
+
+    def on_deleted(result):
+        row, listed, deleted = result
+        if not deleted:
+            # This case might happen if the item was deleted externally between selection and confirmation
+            set_status("Link not found for deletion.", COLORS["status_warn"])
+            load_links()
+            return
+        set_status("Link deleted successfully!", COLORS["status_ok"])
+        if link_list.pager is not pager or not pager.patchable:
+            load_links() # A newer search replaced the list meanwhile, or it can't be patched in place
+        elif listed:
+            link_list.remove_row(row) # Patch just that row out of the list
+        tracer.record("delete.total", started)
+
+    def on_error(e):
         messagebox.showerror("Database Error", f"Failed to delete link (ID: {link_id_to_delete}): {e}", parent=root)
         set_status(f"Error deleting link: {e}", COLORS["status_warn"])
+        load_links()
 
-    load_links() # Refresh list after deletion attempt
+    executor.submit(job, on_deleted, on_error)
+
+# --- Virtual Link List ---
+DEAD_MARK = "\u2717" # Prefixed to links whose last health check failed
+class VirtualLinkList:
+    """Shows a LinkPager through a tk.Listbox one screenful at a time.
+
+    Only the rows in the viewport (plus the partially visible last one) are
+    inserted into the listbox; a page with OVERSCAN extra rows on each side
+    is kept in Python so small scrolls don't touch SQLite. Pages are read on
+    the query worker, never on the Tk thread: the next one is asked for once
+    the viewport is within half an OVERSCAN of the page's edge, and rows a
+    jump lands on show LOADING_TEXT until theirs arrives. The scrollbar is
+    driven from the logical offset, not from the listbox's own yview.
+    """
+    OVERSCAN = 100 # a full-text page costs about the same whatever its size
+    PAGE_SIZE = 100 # rows fetched up front for a new result set
+    LOADING_TEXT = " \u2026"
+
+    def __init__(self, listbox, scrollbar):
+        self.listbox = listbox
+        self.scrollbar = scrollbar
+        self.pager = None
+        self.top = 0 # offset of the first visible row
+        self.visible_rows = int(listbox.cget('height'))
+        self.index_map = {} # { listbox_index: (db_id, header, full_url) } for rendered rows
+        self.selected = None # (db_id, header, full_url), kept while scrolled out of view
+        self.empty_text = ""
+        self._page_start = 0
+        self._page_rows = []
+        self._page_dead = set() # ids in the page whose last health check failed
+        self._page_is_last = False # the page reaches the end of the results
+        self._fetching = False # a page read is on the worker; see _fetch_page
+        self._refetch = False # re-read the page once the running read lands
+        self._patches = 0 # bumped per insert_row/remove_row: pages read before one are stale
+        self._select_at = None # offset to select once its row is loaded; see move_selection
+
+        scrollbar.config(command=self.on_scrollbar)
+        listbox.config(yscrollcommand="")
+        listbox.bind("<<ListboxSelect>>", self.on_select)
+        listbox.bind("<Configure>", self.on_resize)
+        listbox.bind("<MouseWheel>", self.on_mousewheel)
+        listbox.bind("<Button-4>", lambda e: self.scroll_by(-3))
+        listbox.bind("<Button-5>", lambda e: self.scroll_by(3))
+        listbox.bind("<Up>", lambda e: self.move_selection(-1))
+        listbox.bind("<Down>", lambda e: self.move_selection(1))
+        listbox.bind("<Prior>", lambda e: self.move_selection(-self.visible_rows))
+        listbox.bind("<Next>", lambda e: self.move_selection(self.visible_rows))
+        listbox.bind("<Home>", lambda e: self.move_selection(-self.total()))
+        listbox.bind("<End>", lambda e: self.move_selection(self.total()))
+
+    def total(self):
+        return self.pager.total if self.pager else 0
+
+    def set_pager(self, pager, empty_text, first_rows, first_dead, selected_offset):
+        """Switches to a new result set, keeping the selection if it is still in it.
+
+        first_rows (up to PAGE_SIZE rows from offset 0), the dead ids among
+        them and the selection's offset in the result set (None if it isn't
+        in it) are read on the worker by load_links.
+        """
+        self.pager = pager
+        self.empty_text = empty_text
+        self._page_start = 0
+        self._page_rows = list(first_rows)
+        self._page_dead = set(first_dead)
+        self._page_is_last = len(first_rows) < self.PAGE_SIZE
+        self._select_at = None
+        top = self.top
+        if self.selected is not None:
+            if selected_offset is None:
+                self.selected = None
+            elif not top <= selected_offset < top + self.visible_rows:
+                top = selected_offset - self.visible_rows // 2
+        self.scroll_to(top)
+
+    def scroll_to(self, top):
+        self.top = max(0, min(top, self.total() - self.visible_rows))
+        self.render()
+
+    def scroll_by(self, rows):
+        self._select_at = None
+        self.scroll_to(self.top + rows)
+        return "break" # Don't let the listbox scroll itself
+
+    def render(self):
+        rows = self._rows(self.top, self.visible_rows + 1)
+        self.listbox.delete(0, tk.END)
+        if rows is None:
+            # Hold the place of the rows being read; render() runs again when they land
+            self.index_map = {}
+            self.listbox.insert(tk.END, *[self.LOADING_TEXT] * min(self.visible_rows + 1, self.total() - self.top))
+            self._update_scrollbar()
+            return
+        if self._select_at is not None:
+            if 0 <= self._select_at - self.top < len(rows):
+                self.selected = rows[self._select_at - self.top]
+            self._select_at = None
+        self.index_map = dict(enumerate(rows))
+        if not rows:
+            self.listbox.insert(tk.END, self.empty_text)
+            self.listbox.itemconfig(0, {'fg': COLORS["status_warn"]})
+        else:
+            self._insert_rows(rows)
+            selected_index = self.selected_index()
+            if selected_index is not None:
+                self.listbox.selection_set(selected_index)
+                self.listbox.activate(selected_index)
+        self._update_scrollbar()
+
+    def insert_row(self, row):
+        """Shows a newly added row in place, without reloading the list.
+
+        Only the cached page and (if visible) the one listbox line are patched;
+        a row landing above the viewport just shifts the offsets by one. The
+        caller checks (on the worker) that the row is part of the result set.
+        """
+        if self.pager is None:
+            return
+        self._patches += 1
+        where, offset = self._patch_page(row, insert=True)
+        self.pager.note_insert(row)
+        if self.total() == 1 or where is None:
+            self.render()
+        elif where == "before" or (where == "in" and offset < self.top):
+            self.top += 1
+            self._update_scrollbar()
+        elif where == "in" and offset <= self.top + self.visible_rows:
+            self.listbox.insert(offset - self.top, format_link_row(row))
+            if self.listbox.size() > self.visible_rows + 1:
+                self.listbox.delete(tk.END)
+            self._after_patch()
+        else:
+            self._update_scrollbar()
+
+    def remove_row(self, row):
+        """Drops a deleted row in place, without reloading the list.
+
+        The caller checks that the row was part of the result set, since that
+        can no longer be asked of the database once it is deleted.
+        """
+        if self.pager is None:
+            return
+        self._patches += 1
+        if self.selected is not None and self.selected[0] == row[0]:
+            self.selected = None
+        index = self._index_of(row[0])
+        where, offset = self._patch_page(row, insert=False)
+        self.pager.note_delete(row)
+        if self.total() == 0 or where is None:
+            self.render()
+        elif index is not None:
+            self.listbox.delete(index)
+            rows = self._rows(self.top, self.visible_rows + 1)
+            if rows is None:
+                self.render() # The row moving up into view isn't read yet
+                return
+            if len(rows) > self.listbox.size():
+                self._insert_rows(rows[-1:])
+            self._after_patch()
+        elif where == "before" or (where == "in" and offset < self.top):
+            self.top = max(0, self.top - 1)
+            self._update_scrollbar()
+        else:
+            self._update_scrollbar()
+
+    def _insert_rows(self, rows):
+        """Appends rows to the listbox, marking links the last health check found dead."""
+        with tracer.span("render.format"):
+            lines = [format_link_row(row) for row in rows]
+        dead = self._page_dead
+        start = self.listbox.size()
+        with tracer.span("render.insert"):
+            self.listbox.insert(tk.END, *(DEAD_MARK + line if row[0] in dead else line for row, line in zip(rows, lines)))
+        for i, row in enumerate(rows):
+            if row[0] in dead:
+                self.listbox.itemconfig(start + i, {'fg': COLORS["status_warn"]})
+
+    def _patch_page(self, row, insert):
+        """Applies an insert/delete to the cached page; call before the pager's total changes.
+
+        Returns ("before" | "in" | "after", offset); offset is only known for
+        "in". Returns (None, None) if nothing is cached to compare against.
+        """
+        if not self._page_rows:
+            return None, None
+        keys = [nocase_key(row_key(r)) for r in self._page_rows]
+        target = nocase_key(row_key(row))
+        index = bisect.bisect_left(keys, target)
+        found = index < len(keys) and self._page_rows[index][0] == row[0]
+        if index == 0 and self._page_start > 0 and not found:
+            # Above the cached page (and so the viewport): the page moves by one
+            self._page_start += 1 if insert else -1
+            return "before", None
+        if insert:
+            if index == len(keys) and self._page_start + len(keys) < self.total():
+                return "after", None # Past the cached page; nothing shown changes
+            self._page_rows.insert(index, row)
+        elif found:
+            del self._page_rows[index]
+        else:
+            return "after", None
+        return "in", self._page_start + index
+
+    def _after_patch(self):
+        rows = self._rows(self.top, self.listbox.size())
+        if rows is None:
+            self.render()
+            return
+        self.index_map = dict(enumerate(rows))
+        self.listbox.selection_clear(0, tk.END)
+        selected_index = self.selected_index()
+        if selected_index is not None:
+            self.listbox.selection_set(selected_index)
+            self.listbox.activate(selected_index)
+
+    def _index_of(self, link_id):
+        for index, row in self.index_map.items():
+            if row[0] == link_id:
+                return index
+        return None
+
+    def selected_row(self):
+        return self.selected
+
+    def selected_index(self):
+        """Listbox index of the selected row, or None if it is not rendered."""
+        if self.selected is None:
+            return None
+        return self._index_of(self.selected[0])
+
+    def on_select(self, event=None):
+        selection = self.listbox.curselection()
+        if selection and selection[0] in self.index_map:
+            self.selected = self.index_map[selection[0]]
+
+    def move_selection(self, delta):
+        total = self.total()
+        if not total:
+            return "break"
+        selected_index = self.selected_index()
+        if selected_index is not None:
+            self._select(self.top + selected_index + delta)
+        elif self.selected is None:
+            self._select(0)
+        else:
+            # Scrolled out of view: the worker finds where it is now
+            pager, row = self.pager, self.selected
+
+            def on_located(offset):
+                if pager is self.pager:
+                    self._select(0 if offset is None else offset + delta)
+
+            executor.submit(lambda s: self._offset_if_present(pager, row), on_located, kind="page")
+        return "break"
+
+    def _select(self, target):
+        """Scrolls the row at offset target into view; it is selected by render() once its page is read."""
+        target = max(0, min(target, self.total() - 1))
+        if target < self.top:
+            self.top = target
+        elif target >= self.top + self.visible_rows:
+            self.top = target - self.visible_rows + 1
+        self._select_at = target
+        self.scroll_to(self.top)
+
+    def on_scrollbar(self, action, amount, unit=None):
+        self._select_at = None
+        if action == "moveto":
+            self.scroll_to(int(float(amount) * self.total()))
+        elif action == "scroll":
+            step = self.visible_rows if unit == "pages" else 1
+            self.scroll_by(int(amount) * step)
+
+    def on_mousewheel(self, event):
+        return self.scroll_by(-3 if event.delta > 0 else 3)
+
+    def on_resize(self, event=None):
+        bbox = self.listbox.bbox(0)
+        row_height = bbox[3] + 1 if bbox else font.Font(font=self.listbox.cget('font')).metrics('linespace') + 1
+        visible_rows = max(1, self.listbox.winfo_height() // row_height)
+        if visible_rows != self.visible_rows:
+            self.visible_rows = visible_rows
+            self.scroll_to(self.top)
+
+    def _rows(self, offset, limit):
+        """Rows [offset, offset + limit) from the cached page, or None while they are being read."""
+        if not self.pager:
+            return []
+        page_end = self._page_start + len(self._page_rows)
+        at_end = page_end >= self.total() or self._page_is_last
+        if self._page_start <= offset and (offset + limit <= page_end or at_end):
+            if (offset - self._page_start < self.OVERSCAN // 2 and self._page_start > 0
+                    or page_end - offset - limit < self.OVERSCAN // 2 and not at_end):
+                self._fetch_page(max(0, offset - self.OVERSCAN)) # Read ahead; these rows stay until it lands
+            start = offset - self._page_start
+            return self._page_rows[start:start + limit]
+        self._fetch_page(max(0, offset - self.OVERSCAN))
+        return None
+
+    def refresh(self):
+        """Re-reads the cached page (e.g. for new dead marks); the rows shown stay until it lands."""
+        if self.pager is None:
+            return
+        if self._fetching:
+            self._refetch = True
+        else:
+            self._fetch_page(self._page_start)
+
+    def _fetch_page(self, start):
+        """Reads the page at start on the worker, then renders.
+
+        One read at a time: a scrollbar drag asks for many pages, and once the
+        running read lands render() asks only for the one the viewport needs by then.
+        """
+        if self._fetching:
+            return
+        self._fetching = True
+        pager, patches = self.pager, self._patches
+        limit = self.visible_rows + 1 + 2 * self.OVERSCAN
+
+        def job(s):
+            with tracer.span("render.fetch"):
+                rows = pager.rows(start, limit)
+                return rows, s.dead_ids(row[0] for row in rows)
+
+        def on_done(result):
+            self._fetching = False
+            if pager is self.pager and patches == self._patches: # Else changed meanwhile
+                rows, self._page_dead = result
+                self._page_start, self._page_rows, self._page_is_last = start, rows, len(rows) < limit
+            if self._refetch:
+                self._refetch = False
+                self.refresh()
+            self.render() # Reads again if the viewport has moved off the page
+
+        def on_error(e):
+            self._fetching = False
+            set_status(f"Error reading links: {e}", COLORS["status_warn"])
+
+        executor.submit(job, on_done, on_error, kind="page")
+
+    @staticmethod
+    def _offset_if_present(pager, row):
+        """On the worker: row's offset in pager's results, or None if it was deleted or filtered out since it was selected."""
+        current = pager.store.get(row[0])
+        if current is None:
+            return None
+        offset = pager.offset_of(current)
+        candidates = pager.rows(offset, 1)
+        if candidates and candidates[0][0] == current[0]:
+            return offset
+        return None
+
+    def _update_scrollbar(self):
+        total = self.total()
+        if total <= self.visible_rows:
+            self.scrollbar.set(0.0, 1.0)
+        else:
+            self.scrollbar.set(self.top / total, (self.top + self.visible_rows) / total)
 
 # --- Load and Display Links ---
-def load_links():
-    global link_data_map # Allow modification of the global map
-    link_data_map.clear() # Clear previous mapping
+SEARCHING_TEXT = "Searching\u2026"
+search_generation = 0 # Bumped per load; results from older loads are dropped
+FUZZY_RESULTS = 200 # Fuzzy search shows only the best matches
+
+def load_links(after_render=None):
+    """Re-runs the current search on the worker thread and shows the result when it lands.
+
+    after_render() is called once the result is on screen.
+    """
+    global search_generation
+    if executor is None:
+        return # Still starting up; the first load will use the search box as it is then
+    search_generation += 1
+    generation = search_generation
+    search_term = current_search_term()
+    fuzzy = fuzzy_var.get() and bool(search_term) and not split_filters(search_term)[1]
+    order = order_var.get()
+    selected = link_list.selected_row()
+    requested = tracer.clock()
+    executor.interrupt_search() # The running search (if any) is now stale
+    set_status(SEARCHING_TEXT, COLORS["fg"], duration=0)
+
+    def job(s):
+        tracer.record("load.queue_wait", requested)
+        if generation != search_generation:
+            return None # Overtaken while queued; skip the query entirely
+        if order in USAGE_ORDERS and len(usage):
+            flush_usage_job(s) # List the opens not yet written, too
+        with tracer.span("load.query"), s.snapshot():
+            catch_up_changes(s) # The result read below includes every change so far
+            pager, selected_offset = run_query(s)
+            first_rows = pager.rows(0, VirtualLinkList.PAGE_SIZE)
+            return pager, first_rows, s.dead_ids(row[0] for row in first_rows), selected_offset
+
+    def run_query(s):
+        """Returns (pager, offset of the selected link or None). The pager reads through s,
+        so it is only ever asked for rows on the worker (see VirtualLinkList._fetch_page)."""
+        if fuzzy:
+            rows = s.fuzzy_search(search_term, k=FUZZY_RESULTS)
+            return RankedPager(s, search_term, rows), offset_in(rows)
+        cached_rows = search_cache.get(search_term, order) if search_term else None
+        if search_term and cached_rows is None:
+            # One query both fills the cache and tells us if the result is small enough to cache
+            rows = s.query(search_term, order=order, limit=search_cache.max_rows + 1)
+            if len(rows) <= search_cache.max_rows:
+                search_cache.put(search_term, rows, order)
+                cached_rows = rows
+        if cached_rows is not None:
+            return ListPager(s, search_term, cached_rows, order), offset_in(cached_rows)
+        pager = LinkPager(s, search_term, total=s.count(search_term), order=order)
+        selected_offset = None
+        if selected is not None:
+            current = s.get(selected[0])
+            if current is not None and s.matches(search_term, current[0]):
+                selected_offset = s.position(search_term, s.sort_key(current, order), order)
+        return pager, selected_offset
+
+    def offset_in(rows):
+        if selected is None:
+            return None
+        return next((i for i, row in enumerate(rows) if row[0] == selected[0]), None)
+
+    def on_loaded(result):
+        if result is None or generation != search_generation:
+            return
+        pager, first_rows, first_dead, selected_offset = result
+        clear_searching_status()
+        render_started = tracer.clock()
+        link_list.set_pager(pager, " No matches found." if search_term else " No links saved yet.",
+                            first_rows, first_dead, selected_offset)
+        if isinstance(pager, LinkPager) and pager.total > LinkPager.ANCHOR_EVERY:
+            seed_anchors(pager)
+        tracer.record("load.render", render_started)
+        tracer.record("load.total", requested)
+        if after_render:
+            after_render()
+
+    def on_error(e):
+        if generation != search_generation:
+            return # Interrupted because a newer search superseded it
+        clear_searching_status()
+        messagebox.showerror("Database Error", f"Failed to load links: {e}", parent=root)
+        set_status(f"Error loading links: {e}", COLORS["status_warn"])
 
-    search_term = search_entry.get().strip().lower()
-    selected_indices = listbox.curselection()
-    selected_id = None
-    if selected_indices:
-         # Try to get ID of previously selected item to restore selection
-         prev_selected_data = get_selected_link_data() # Use helper
-         if prev_selected_data:
-              selected_id = prev_selected_data[0] # Get the DB ID
+    executor.submit(job, on_loaded, on_error, kind="search")
 
-    listbox.delete(0, tk.END)
+def seed_anchors(pager):
+    """Seeds a large result's anchors on the worker, a chunk per job so page reads can go in between.
 
-    try:
-        with sqlite3.connect("links.db") as conn:
-            cursor = conn.cursor()
-            if search_term:
-                query = """
-                    SELECT id, header, url FROM links
-                    WHERE LOWER(header) LIKE ? OR LOWER(url) LIKE ?
-                    ORDER BY header COLLATE NOCASE ASC
-                """
-                like_term = f"%{search_term}%"
-                cursor.execute(query, (like_term, like_term))
-            else:
-                cursor.execute("SELECT id, header, url FROM links ORDER BY header COLLATE NOCASE ASC")
-
-            links = cursor.fetchall()
-
-        restored_selection_idx = -1
-        if not links and search_term:
-             listbox.insert(tk.END, " No matches found.")
-             listbox.itemconfig(0, {'fg': COLORS["status_warn"]})
-        elif not links:
-             listbox.insert(tk.END, " No links saved yet.")
-             listbox.itemconfig(0, {'fg': COLORS["status_warn"]})
-        else:
-            for current_index, link_tuple in enumerate(links):
-                link_id, header, url = link_tuple
-
-                # Store full data in the map
-                link_data_map[current_index] = link_tuple
-
-                # Truncate URL display cleanly (same as before)
-                max_url_len = 35
-                display_url = url
-                if len(url) > max_url_len:
-                    scheme_end = url.find("://") + 3
-                    domain_part = url[scheme_end:].split('/')[0]
-                    if len(domain_part) < max_url_len - 5:
-                        display_url = url[:scheme_end] + domain_part + "/..."
-                    else:
-                        display_url = url[:max_url_len - 3] + "..."
-
-                list_item = f" {header}  ({display_url})"
-                listbox.insert(tk.END, list_item)
-
-                # Try to restore selection based on ID
-                if selected_id and link_id == selected_id and restored_selection_idx == -1:
-                    restored_selection_idx = current_index
-
-            # After loop, apply selection if found
-            if restored_selection_idx != -1:
-                 listbox.selection_set(restored_selection_idx)
-                 listbox.activate(restored_selection_idx)
-                 listbox.see(restored_selection_idx)
-
-
-    except Exception as e:
-        messagebox.showerror("Database Error", f"Failed to load links: {e}", parent=root)
-        set_status(f"Error loading links: {e}", COLORS["status_warn"])
+    Submitted as a search, so the next search interrupts it.
+    """
+    def on_seeded(more):
+        if more and link_list.pager is pager:
+            seed_anchors(pager)
+
+    executor.submit(lambda s: pager.seed_anchors(), on_seeded, lambda e: None, kind="search")
+
+def import_file():
+    if not backend_ready():
+        return
+    path = filedialog.askopenfilename(parent=root, title="Import Bookmarks",
+                                      filetypes=[("Bookmark files", "*.html *.htm *.csv *.jsonl *.ndjson"), ("All files", "*.*")])
+    if not path:
+        return
+    set_status("Importing\u2026", COLORS["fg"], duration=0)
+    from linksaver.bookmarks import import_links # Only needed here; kept off the startup path
+
+    def job(s):
+        result = import_links(s, path, progress=lambda n, d: executor.report(show_import_progress, (n, d)))
+        search_cache.invalidate()
+        return result
+
+    def on_imported(result):
+        set_status(f"Imported {result['inserted']:,} links ({result['duplicates']:,} duplicates, "
+                   f"{result['skipped']:,} skipped).", COLORS["status_ok"], duration=6000)
+        load_links()
+
+    def on_error(e):
+        messagebox.showerror("Import Error", f"Could not import '{path}':\n{e}", parent=root)
+        set_status(f"Import failed: {e}", COLORS["status_warn"])
+        load_links() # Batches committed before the error are kept
+
+    executor.submit(job, on_imported, on_error)
+
+def show_import_progress(counts):
+    inserted, duplicates = counts
+    set_status(f"Importing\u2026 {inserted:,} added, {duplicates:,} duplicates", COLORS["fg"], duration=0)
+
+def export_file():
+    if not backend_ready():
+        return
+    path = filedialog.asksaveasfilename(parent=root, title="Export Bookmarks", defaultextension=".html",
+                                        filetypes=[("Bookmark HTML", "*.html"), ("CSV", "*.csv"), ("JSON Lines", "*.jsonl")])
+    if not path:
+        return
+    set_status("Exporting\u2026", COLORS["fg"], duration=0)
+    from linksaver.bookmarks import export_links
+
+    def on_progress(written):
+        set_status(f"Exporting\u2026 {written:,} links", COLORS["fg"], duration=0)
+
+    def on_exported(count):
+        set_status(f"Exported {count:,} links.", COLORS["status_ok"])
+
+    def on_error(e):
+        messagebox.showerror("Export Error", f"Could not export to '{path}':\n{e}", parent=root)
+        set_status(f"Export failed: {e}", COLORS["status_warn"])
+
+    executor.submit(lambda s: export_links(s, path, progress=lambda n: executor.report(on_progress, n)),
+                    on_exported, on_error)
+
+# --- List Order and Usage ---
+# Opens and copies are buffered (see linksaver/usage.py) and written by the
+# worker in one transaction every USAGE_FLUSH_MS, or sooner once
+# USAGE_FLUSH_LINKS links are waiting, before a load in a usage order, and on close.
+ORDER_LABELS = [("header", "A\u2013Z"), ("added", "Recently added"), ("opened", "Recently opened"), ("popular", "Most opened")]
+USAGE_FLUSH_MS = 5000
+USAGE_FLUSH_LINKS = 50
+usage = UsageBuffer()
+usage_flush_timer = None
+
+def record_usage(link_id):
+    global usage_flush_timer
+    usage.record(link_id)
+    if len(usage) >= USAGE_FLUSH_LINKS:
+        flush_usage()
+    elif usage_flush_timer is None:
+        usage_flush_timer = root.after(USAGE_FLUSH_MS, flush_usage)
+
+def flush_usage():
+    global usage_flush_timer
+    if usage_flush_timer is not None:
+        root.after_cancel(usage_flush_timer)
+        usage_flush_timer = None
+    if executor is not None and len(usage):
+        executor.submit(flush_usage_job, on_usage_flushed,
+                        lambda e: set_status(f"Error saving link usage: {e}", COLORS["status_warn"]))
+
+def flush_usage_job(s):
+    """On the worker: writes the buffered opens. Cached results in a usage order are stale after that."""
+    flushed = usage.flush(s)
+    if flushed:
+        search_cache.invalidate(USAGE_ORDERS)
+    return flushed
+
+def on_usage_flushed(flushed):
+    pager = link_list.pager
+    if flushed and pager is not None and pager.order in USAGE_ORDERS:
+        load_links() # The rows moved, and a LinkPager's anchors would now skip or repeat some
+
+def set_order(order):
+    order_menu_button.config(text=f"Sort: {dict(ORDER_LABELS)[order]} \u25be")
+    load_links()
+
+# --- Tags ---
+# The tag filter is kept apart from the search box and appended to the search
+# term as "tag:NAME" words, which the store turns into conditions on link_tags.
+TAG_MENU_SIZE = 30 # most used tags offered in the filter menu
+active_tags = [] # filter: links must have all of these
+tag_menu_vars = [] # keeps the menu's BooleanVars alive
+tag_counts = None # (name, count) pairs from the worker's last read; None until the first one lands
+
+def current_search_term():
+    """The search box text plus the active tag filter, as the store expects it."""
+    words = [search_entry.get().strip().lower()] + [TAG_PREFIX + tag for tag in active_tags]
+    return " ".join(w for w in words if w)
+
+def refresh_tag_menu():
+    """Shows the tag counts read last and has the worker re-read them (no GROUP BY; cheap enough per click).
+
+    If they changed, the menu is rebuilt when they land, even while it is open.
+    """
+    build_tag_menu()
+    if executor is not None:
+        executor.submit(lambda s: s.tags(TAG_MENU_SIZE), on_tags_read, lambda e: None)
+
+def on_tags_read(tags):
+    global tag_counts
+    if tags != tag_counts:
+        tag_counts = tags
+        build_tag_menu()
+
+def build_tag_menu():
+    tag_menu.delete(0, tk.END)
+    tag_menu_vars.clear()
+    if tag_counts is None:
+        tag_menu.add_command(label="Loading tags\u2026", state=tk.DISABLED)
+        return
+    tags = list(tag_counts)
+    listed = {name for name, _ in tags}
+    tags += [(name, 0) for name in active_tags if name not in listed]
+    if not tags:
+        tag_menu.add_command(label="No tags yet (select a link and press Tag…)", state=tk.DISABLED)
+    for name, count in tags:
+        var = tk.BooleanVar(value=name in active_tags)
+        tag_menu_vars.append(var)
+        tag_menu.add_checkbutton(label=f"{name} ({count:,})", variable=var, command=lambda n=name: toggle_tag_filter(n))
+    if active_tags:
+        tag_menu.add_separator()
+        tag_menu.add_command(label="Show all tags", command=clear_tag_filter)
+
+def toggle_tag_filter(name):
+    if name in active_tags:
+        active_tags.remove(name)
+    else:
+        active_tags.append(name)
+    update_tag_button()
+    load_links()
+
+def clear_tag_filter():
+    active_tags.clear()
+    update_tag_button()
+    load_links()
+
+def update_tag_button():
+    tag_menu_button.config(text=f"Tags: {', '.join(active_tags)} \u25be" if active_tags else "All tags \u25be")
+
+def parse_tag_input(text):
+    """Splits "python, -old" into (["python"], ["old"])."""
+    add, remove = [], []
+    for part in text.split(","):
+        part = part.strip()
+        if part.startswith("-"):
+            remove.append(part[1:])
+        elif part:
+            add.append(part)
+    return add, remove
+
+def edit_tags(event=None):
+    """Adds or removes tags on the selected link, or on every link in the list if none is selected."""
+    pager = link_list.pager
+    if pager is None:
+        return
+    selected = link_list.selected_row()
+    if selected is not None:
+        # Its current tags are read on the worker; the prompt opens when they land
+        executor.submit(lambda s: s.tags_of(selected[0]), lambda current: ask_for_tags(pager, selected, current),
+                        lambda e: messagebox.showerror("Database Error", f"Failed to read tags: {e}", parent=root))
+    elif pager.total:
+        ask_for_tags(pager, None)
+    else:
+        set_status("No links to tag.", COLORS["status_warn"])
+
+def ask_for_tags(pager, selected, current=None):
+    """Prompts for tags to add/remove on the selected link (current: its tags), or on all of pager's links."""
+    hint = "Comma separated; put - before a tag to remove it:"
+    if selected is not None:
+        prompt = f"Tags for \"{selected[1][:50]}\" (now: {', '.join(current) or 'none'})\n\n{hint}"
+    else:
+        prompt = f"Tags for all {pager.total:,} links in the list\n\n{hint}"
+    answer = simpledialog.askstring("Tag Links", prompt, parent=root)
+    add, remove = parse_tag_input(answer or "")
+    if not add and not remove:
+        return
+    search_term = pager.search_term
+    ranked_ids = [row[0] for row in pager.rows(0, pager.total)] if pager.ranked and selected is None else None
+
+    def job(s):
+        # Either way one transaction, however many links
+        if selected is not None:
+            return s.tag_links([selected[0]], add, remove)
+        if ranked_ids is not None:
+            return s.tag_links(ranked_ids, add, remove) # Just the fuzzy matches shown
+        return s.tag_search(search_term, add, remove)
+
+    def on_tagged(changed):
+        target = "the link" if selected is not None else f"{pager.total:,} links"
+        set_status(f"Updated tags on {target} ({changed:,} changes)", COLORS["status_ok"])
+        if changed and active_tags:
+            load_links() # The tag filter's results may have changed
+
+    def on_error(e):
+        messagebox.showerror("Database Error", f"Failed to update tags: {e}", parent=root)
+
+    executor.submit(job, on_tagged, on_error)
+
+# --- Link Health Check ---
+# Runs on its own thread (it can take minutes), not the query worker
+HEALTH_POLL_MS = 300
+HEALTH_CLOSE_WAIT = 2 # seconds on_close waits for a cancelled check to save its last results
+health_checker = None
+health_thread = None
+health_progress = None # (checked, dead, total), written by the checker thread
+health_result = None
+
+def toggle_health_check():
+    """Starts a background check of links not checked in the last day, or stops the running one."""
+    global health_checker, health_thread, health_progress, health_result
+    if health_checker is not None:
+        health_checker.cancel()
+        set_status("Stopping link check…", COLORS["fg"], duration=0)
+        return
+    if store is None:
+        return # Still starting up
+    health_progress = health_result = None
+
+    def progress(checked, dead, total):
+        global health_progress
+        health_progress = (checked, dead, total)
+
+    def run(checker):
+        global health_result
+        try:
+            health_result = checker.run()
+        except Exception as e:
+            health_result = e
+
+    from linksaver.health import HealthChecker # Pulls in asyncio and ssl, so not at startup
+    health_checker = HealthChecker(store.db_path, progress=progress)
+    health_thread = threading.Thread(target=run, args=(health_checker,), name="link-health", daemon=True)
+    health_thread.start()
+    check_button.config(text="Stop Check")
+    set_status("Checking links…", COLORS["fg"], duration=0)
+    root.after(HEALTH_POLL_MS, poll_health_check, None)
+
+def poll_health_check(shown):
+    global health_checker
+    progress = health_progress
+    if progress != shown:
+        checked, dead, total = progress
+        set_status(f"Checked {checked:,} of {total:,} links, {dead:,} dead", COLORS["fg"], duration=0)
+        link_list.refresh() # Mark newly found dead links
+    result = health_result
+    if result is None:
+        root.after(HEALTH_POLL_MS, poll_health_check, progress)
+        return
+    health_checker = None
+    check_button.config(text="Check Links")
+    if isinstance(result, Exception):
+        set_status(f"Link check failed: {result}", COLORS["status_warn"])
+        return
+    if split_filters(current_search_term())[1]:
+        load_links() # The "is:dead" results changed
+    else:
+        link_list.refresh()
+    verb = "Stopped after checking" if result["cancelled"] else "Checked"
+    set_status(f"{verb} {result['checked']:,} links: {result['dead']:,} dead (search \"is:dead\" to list them)",
+               COLORS["status_warn"] if result["dead"] else COLORS["status_ok"], duration=8000)
+
+# --- Changes From Other Windows ---
+# Another instance (or the CLI) may change the same database. While the worker
+# is idle, PRAGMA data_version is polled; when it moves, the link_changes log
+# says which links changed, and those rows are patched into the list.
+WATCH_MS = 500
+WATCH_MAX_PATCH = 200 # more changes than this at once: reload instead
+watch_state = {"seq": None, "version": None} # only touched on the worker
+
+def catch_up_changes(s):
+    """On the worker, inside s.snapshot(): marks every change so far as seen."""
+    latest = s.change_seq()
+    if watch_state["seq"] != latest:
+        search_cache.invalidate()
+    s.forget_own_changes(latest)
+    watch_state["seq"], watch_state["version"] = latest, s.data_version()
+
+def poll_changes():
+    if executor.pending == 0: # Never delay a search or a write
+        pager = link_list.pager
+        executor.submit(lambda s: read_changes(s, pager), lambda result: apply_changes(result, pager),
+                        lambda e: None, kind="watch")
+    root.after(WATCH_MS, poll_changes)
+
+def read_changes(s, pager):
+    """Worker job: returns None (nothing new), "reload", or
+
+    ({link_id: (old_row, new_row)}, ids of the new rows that are in pager's results).
+    """
+    version = s.data_version()
+    if watch_state["seq"] is None or version == watch_state["version"]:
+        return None
+    with s.snapshot():
+        changes, watch_state["seq"] = s.changes_since(watch_state["seq"], limit=WATCH_MAX_PATCH)
+        watch_state["version"] = version
+    if changes == {}:
+        return None # Only our own writes, or other tables (link health)
+    search_cache.invalidate()
+    if changes is None:
+        return "reload"
+    listed = set()
+    if pager is not None and pager.patchable:
+        listed = {link_id for link_id, (_, new_row) in changes.items() if new_row is not None and pager.contains(link_id)}
+    return changes, listed
+
+def apply_changes(result, pager):
+    if result is None or pager is None or pager is not link_list.pager:
+        return # Nothing new, or a newer load's result includes the changes
+    search_term = pager.search_term
+    if result == "reload" or not pager.patchable or split_filters(search_term)[1]:
+        load_links() # Too many changes, or results that can't be patched row by row
+        set_status("Links changed in another window", COLORS["fg"])
+        return
+    changes, listed = result
+    # Deleted rows can't be looked up any more, so match their old text
+    was_listed = row_matcher(search_term, store.fts_enabled) if search_term else lambda row: True
+    selected = link_list.selected_row()
+    for old_row, new_row in changes.values():
+        if old_row is not None and was_listed(old_row):
+            link_list.remove_row(old_row)
+        if new_row is not None and new_row[0] in listed:
+            link_list.insert_row(new_row)
+    if selected is not None and selected[0] in changes and link_list.selected_row() is None:
+        new_row = changes[selected[0]][1]
+        if new_row is not None and new_row[0] in listed:
+            link_list.selected = new_row # Edited elsewhere: keep it selected
+            link_list.render()
+    set_status("1 link changed in another window" if len(changes) == 1 else f"{len(changes)} links changed in another window",
+               COLORS["fg"])
+
+def show_cache_stats(event=None):
+    if not backend_ready():
+        return
+    stats = search_cache.stats()
+    set_status(f"Search cache: {stats['hits']} hits, {stats['narrowed']} narrowed, {stats['misses']} misses, "
+               f"{stats['entries']} entries (~{stats['bytes'] // 1024} KB)", COLORS["fg"], duration=6000)
+
+# --- Performance Overlay ---
+# (label, span) pairs shown as p50/p90 ms; F4 toggles tracing, see linksaver/perf.py
+PERF_OVERLAY_SPANS = [("search", "load.total"), ("sql", "load.query"), ("draw", "load.render")]
+PERF_OVERLAY_MS = 500
+
+def toggle_perf_overlay(event=None):
+    tracer.set_enabled(not tracer.enabled)
+    if tracer.enabled:
+        perf_label.pack(side=tk.RIGHT, before=status_label, padx=(10, 0))
+        update_perf_overlay()
+        set_status("Performance tracing on (Shift+F4: profile next search, Ctrl+F4: save trace)", COLORS["fg"], duration=4000)
+    else:
+        perf_label.pack_forget()
+
+def update_perf_overlay():
+    if not tracer.enabled:
+        return
+    summary = tracer.summary()
+    parts = [f"{label} {summary[name]['p50_ms']:.0f}/{summary[name]['p90_ms']:.0f}"
+             for label, name in PERF_OVERLAY_SPANS if name in summary]
+    perf_label.config(text=" · ".join(parts) + " ms" if parts else "no samples yet")
+    root.after(PERF_OVERLAY_MS, update_perf_overlay)
+
+def profile_next_search(event=None):
+    if not tracer.enabled:
+        toggle_perf_overlay()
+    tracer.profile_next("load.query")
+    set_status("Profiling the next search…", COLORS["fg"], duration=4000)
+
+def save_trace(event=None):
+    if not tracer.histograms:
+        set_status("No trace recorded yet (F4 turns tracing on).", COLORS["status_warn"])
+        return
+    path = filedialog.asksaveasfilename(parent=root, title="Save Trace", defaultextension=".json",
+                                        initialfile="linksaver-trace.json", filetypes=[("JSON", "*.json")])
+    if path:
+        try:
+            tracer.dump(path)
+            set_status(f"Trace saved to {path}", COLORS["status_ok"])
+        except OSError as e:
+            set_status(f"Error saving trace: {e}", COLORS["status_warn"])
+
+def clear_searching_status():
+    if status_label.cget('text') == SEARCHING_TEXT:
+        status_label.config(text="")
 
 # --- UI Helper Functions ---
 def on_hover_enter(event, widget, hover_color=COLORS["button_hover"]):
@@ -290,18 +1194,46 @@ def set_status(message, color=COLORS["status_ok"], duration=3000):
             root.after(duration, lambda current_msg=message: status_label.config(text="") if status_label.cget('text') == current_msg else None)
     except tk.TclError: pass
 
+SEARCH_DEBOUNCE_MS = 60
 search_timer = None
+debounce_started = 0 # tracer clock at the first key of the current burst
 def debounced_search(event=None):
-    global search_timer
+    global search_timer, debounce_started
     if search_timer:
         root.after_cancel(search_timer)
-    search_timer = root.after(300, load_links)
+    else:
+        debounce_started = tracer.clock()
+    # Short debounce just coalesces key bursts; stale searches are cancelled anyway
+    search_timer = root.after(SEARCH_DEBOUNCE_MS, run_debounced_search)
+
+def run_debounced_search():
+    global search_timer
+    search_timer = None
+    tracer.record("search.debounce", debounce_started)
+    load_links()
 
 def clear_search_and_reload():
     search_entry.delete(0, tk.END)
     load_links()
     search_entry.focus_set()
 
+def on_close():
+    if health_checker is not None:
+        health_checker.cancel()
+        health_thread.join(HEALTH_CLOSE_WAIT) # A daemon thread dies at exit, before its final flush
+    if store is not None: # Closed before the database was open
+        flush_usage() # Queued ahead of the stop, so it is written first
+        executor.stop()
+        store.close()
+    dump_on_exit()
+    root.destroy()
+
+# --- Headless CLI ---
+# `python linksaverapp.py import FILE` etc. still works; see linksaver/cli.py
+if __name__ == "__main__" and len(sys.argv) > 1:
+    from linksaver.cli import main as cli_main
+    sys.exit(cli_main(sys.argv[1:]))
+
 # --- GUI Setup ---
 root = tk.Tk()
 root.title("Link Saver Pro")
@@ -309,25 +1241,58 @@ root.geometry("650x650") # Slightly wider for new button
 root.configure(bg=COLORS["bg"])
 root.minsize(550, 500)
 
-setup_db()
-
-# --- Fonts (same as before) ---
-try:
-    base_font_family = "Segoe UI"
-    root.tk.call('font', 'families')
-    if base_font_family not in font.families(): base_font_family = "Helvetica"
-    if base_font_family not in font.families(): base_font_family = "Arial"
-except tk.TclError: base_font_family = "Arial"
-
+# Opened by start_backend once the window is on screen
+store = None
+executor = None
+search_cache = None
+
+# --- Fonts ---
+# First installed family wins; the last of each list is always accepted
+UI_FONTS = ["Segoe UI", "Helvetica", "Arial"]
+MONO_FONTS = ["Consolas", "Courier New", "Courier"]
+
+def font_cache_path():
+    base = os.environ.get("LOCALAPPDATA") if sys.platform == "win32" else None
+    base = base or os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "linksaver", "fonts.json")
+
+def resolve_font_families():
+    """Returns (ui_family, mono_family), enumerating installed fonts at most once per machine.
+
+    font.families() takes a noticeable time on systems with many fonts, so
+    the choice is saved to a small cache file, keyed by platform, Tk version
+    and the preference lists.
+    """
+    key = [sys.platform, root.tk.call("info", "patchlevel"), UI_FONTS, MONO_FONTS]
+    path = font_cache_path()
+    try:
+        with open(path, encoding="utf-8") as f:
+            cached = json.load(f)
+        if cached["key"] == key:
+            return cached["ui"], cached["mono"]
+    except (OSError, ValueError, KeyError, TypeError):
+        pass
+    try:
+        families = set(font.families(root))
+    except tk.TclError:
+        families = set()
+    ui_family = next((f for f in UI_FONTS if f in families), UI_FONTS[-1])
+    mono_family = next((f for f in MONO_FONTS if f in families), MONO_FONTS[-1])
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"key": key, "ui": ui_family, "mono": mono_family}, f)
+    except OSError:
+        pass # Read-only home; resolve again next time
+    return ui_family, mono_family
+
+fonts_started = time.perf_counter_ns()
+base_font_family, mono_font_family = resolve_font_families()
+fonts_ns = time.perf_counter_ns() - fonts_started
 default_font = font.Font(family=base_font_family, size=10)
 bold_font = font.Font(family=base_font_family, size=12, weight="bold")
 label_font = font.Font(family=base_font_family, size=10, weight="bold")
-entry_font = font.Font(family="Consolas", size=10)
-if "Consolas" not in font.families():
-    try:
-        entry_font = font.Font(family="Courier New", size=10)
-        if "Courier New" not in font.families(): entry_font = font.Font(family="Courier", size=10)
-    except tk.TclError: entry_font = default_font
+entry_font = font.Font(family=mono_font_family, size=10)
 root.option_add("*Font", default_font)
 
 # --- Main Frames (same layout) ---
@@ -343,6 +1308,9 @@ button_frame.pack(fill=tk.X, pady=(5, 10)) # pady applied here
 search_frame = tk.Frame(root, bg=COLORS["bg"], padx=25)
 search_frame.pack(fill=tk.X, pady=(0, 10))
 
+tag_frame = tk.Frame(root, bg=COLORS["bg"], padx=25)
+tag_frame.pack(fill=tk.X, pady=(0, 10))
+
 list_frame = tk.Frame(root, bg=COLORS["bg"], padx=25)
 list_frame.pack(fill=tk.BOTH, expand=True, pady=0)
 
@@ -392,30 +1360,110 @@ clear_search_button = tk.Button(search_frame, text="✕", command=clear_search_a
 clear_search_button.pack(side=tk.LEFT, padx=(5, 0))
 clear_search_button.bind("<Enter>", lambda e: on_hover_enter(e, clear_search_button, COLORS["delete_flash"]))
 clear_search_button.bind("<Leave>", lambda e: on_hover_leave(e, clear_search_button, COLORS["entry_bg"]))
+fuzzy_var = tk.BooleanVar(value=False)
+fuzzy_check = tk.Checkbutton(search_frame, text="Fuzzy", variable=fuzzy_var, command=load_links, bg=COLORS["bg"], fg=COLORS["fg"], selectcolor=COLORS["entry_bg"], activebackground=COLORS["bg"], activeforeground=COLORS["fg"], relief=tk.FLAT, highlightthickness=0, font=default_font, cursor="hand2")
+fuzzy_check.pack(side=tk.LEFT, padx=(8, 0))
+
+# --- Tag Filter ---
+tag_menu_button = tk.Menubutton(tag_frame, text="All tags \u25be", bg=COLORS["entry_bg"], fg=COLORS["fg"], relief=tk.FLAT, font=default_font, activebackground=COLORS["highlight"], activeforeground=COLORS["fg"], cursor="hand2", padx=8, pady=3)
+tag_menu = tk.Menu(tag_menu_button, tearoff=False, postcommand=refresh_tag_menu, bg=COLORS["entry_bg"], fg=COLORS["fg"], activebackground=COLORS["accent"], activeforeground=COLORS["button_fg"], selectcolor=COLORS["fg"], font=default_font)
+tag_menu_button.config(menu=tag_menu)
+tag_menu_button.pack(side=tk.LEFT)
+order_var = tk.StringVar(value="header")
+order_menu_button = tk.Menubutton(tag_frame, text=f"Sort: {ORDER_LABELS[0][1]} \u25be", bg=COLORS["entry_bg"], fg=COLORS["fg"], relief=tk.FLAT, font=default_font, activebackground=COLORS["highlight"], activeforeground=COLORS["fg"], cursor="hand2", padx=8, pady=3)
+order_menu = tk.Menu(order_menu_button, tearoff=False, bg=COLORS["entry_bg"], fg=COLORS["fg"], activebackground=COLORS["accent"], activeforeground=COLORS["button_fg"], selectcolor=COLORS["fg"], font=default_font)
+for order, label in ORDER_LABELS:
+    order_menu.add_radiobutton(label=label, value=order, variable=order_var, command=lambda o=order: set_order(o))
+order_menu_button.config(menu=order_menu)
+order_menu_button.pack(side=tk.LEFT, padx=(8, 0))
+tag_button = tk.Button(tag_frame, text="Tag\u2026", command=edit_tags, bg=COLORS["entry_bg"], fg=COLORS["fg"], relief=tk.FLAT, font=default_font, activebackground=COLORS["highlight"], activeforeground=COLORS["fg"], cursor="hand2", padx=8, pady=3, bd=0)
+tag_button.pack(side=tk.RIGHT)
+tag_button.bind("<Enter>", lambda e: on_hover_enter(e, tag_button, COLORS["highlight"]))
+tag_button.bind("<Leave>", lambda e: on_hover_leave(e, tag_button, COLORS["entry_bg"]))
 
 # --- Listbox with Scrollbar ---
 scrollbar = tk.Scrollbar(list_frame, orient=tk.VERTICAL, relief=tk.FLAT, troughcolor=COLORS["bg"], bg=COLORS["entry_bg"], activebackground=COLORS["accent"], width=14, bd=0)
-listbox = tk.Listbox(list_frame, bg=COLORS["listbox_bg"], fg=COLORS["listbox_fg"], selectbackground=COLORS["highlight"], selectforeground=COLORS["fg"], relief=tk.FLAT, highlightthickness=0, bd=0, font=default_font, activestyle='none', yscrollcommand=scrollbar.set, height=15)
-scrollbar.config(command=listbox.yview)
+listbox = tk.Listbox(list_frame, bg=COLORS["listbox_bg"], fg=COLORS["listbox_fg"], selectbackground=COLORS["highlight"], selectforeground=COLORS["fg"], relief=tk.FLAT, highlightthickness=0, bd=0, font=default_font, activestyle='none', height=15)
 scrollbar.pack(side=tk.RIGHT, fill=tk.Y, pady=(2,2), padx=(0,2))
 listbox.pack(side=tk.LEFT, fill=tk.BOTH, expand=True, pady=(2,2), padx=(2,0))
 listbox.bind("<Double-Button-1>", open_link)
 listbox.bind("<Return>", open_link)
+link_list = VirtualLinkList(listbox, scrollbar)
 
 # --- Footer ---
 status_label = tk.Label(footer_frame, text="", bg=COLORS["bg"], fg=COLORS["status_ok"], font=default_font, anchor='e')
 status_label.pack(side=tk.RIGHT, fill=tk.X, expand=True, padx=(10, 0))
-quit_button = tk.Button(footer_frame, text="Quit", command=root.destroy, **button_opts)
+perf_label = tk.Label(footer_frame, text="", bg=COLORS["bg"], fg=COLORS["fg"], font=default_font)
+if tracer.enabled:
+    perf_label.pack(side=tk.RIGHT, before=status_label, padx=(10, 0))
+quit_button = tk.Button(footer_frame, text="Quit", command=on_close, **button_opts)
 quit_button.pack(side=tk.LEFT)
 quit_button.bind("<Enter>", lambda e: on_hover_enter(e, quit_button, COLORS["delete_flash"]))
 quit_button.bind("<Leave>", lambda e: on_hover_leave(e, quit_button, COLORS["button"]))
-
-# --- Initial Load & Fade-in ---
-load_links()
+import_button = tk.Button(footer_frame, text="Import\u2026", command=import_file, **button_opts)
+import_button.pack(side=tk.LEFT, padx=(5, 0))
+import_button.bind("<Enter>", lambda e: on_hover_enter(e, import_button, COLORS["button_hover"]))
+import_button.bind("<Leave>", lambda e: on_hover_leave(e, import_button, COLORS["button"]))
+export_button = tk.Button(footer_frame, text="Export\u2026", command=export_file, **button_opts)
+export_button.pack(side=tk.LEFT, padx=(5, 0))
+export_button.bind("<Enter>", lambda e: on_hover_enter(e, export_button, COLORS["button_hover"]))
+export_button.bind("<Leave>", lambda e: on_hover_leave(e, export_button, COLORS["button"]))
+check_button = tk.Button(footer_frame, text="Check Links", command=toggle_health_check, **button_opts)
+check_button.pack(side=tk.LEFT, padx=(5, 0))
+check_button.bind("<Enter>", lambda e: on_hover_enter(e, check_button, COLORS["button_hover"]))
+check_button.bind("<Leave>", lambda e: on_hover_leave(e, check_button, COLORS["button"]))
+
+# --- Startup ---
+# The window is built and shown first; the database is opened and the first
+# screenful of links loaded only after it has been painted.
+# LINKSAVER_STARTUP_REPORT=1 prints the timings (=exit also quits, for benchmarks).
+STARTUP_FALLBACK_MS = 1000 # Start anyway if the window is never mapped (e.g. launched minimized)
+first_paint_ns = None
+
+def on_first_map(event):
+    if event.widget is root:
+        root.unbind("<Map>")
+        root.after_idle(start_backend)
+
+def start_backend():
+    global first_paint_ns
+    if first_paint_ns is not None:
+        return
+    root.update_idletasks() # Finish painting the empty window first
+    first_paint_ns = time.perf_counter_ns()
+    # The worker opens the database first, so migrating an old one happens off the Tk thread
+    worker = QueryExecutor(root, DEFAULT_DB_PATH)
+    worker.submit(lambda s: None, lambda _: on_backend_open(worker), on_backend_failed)
+
+def on_backend_open(worker):
+    global store, executor, search_cache
+    store = LinkStore() # Already migrated by the worker, so this only connects
+    executor = worker
+    search_cache = SearchCache(store.fts_enabled)
+    load_links(after_render=finish_startup)
+    executor.submit(lambda s: s.tags(TAG_MENU_SIZE), on_tags_read, lambda e: None) # So the first menu click has them
+    root.after(WATCH_MS, poll_changes)
+
+def on_backend_failed(e):
+    messagebox.showerror("Database Error", f"Failed to open the database: {e}", parent=root)
+
+def finish_startup():
+    first_rows_ns = time.perf_counter_ns()
+    tracer.record("startup.first_paint", STARTED_NS, first_paint_ns)
+    tracer.record("startup.first_rows", STARTED_NS, first_rows_ns)
+    timings = {"fonts_ms": round(fonts_ns / 1e6, 1), "first_paint_ms": round((first_paint_ns - STARTED_NS) / 1e6, 1),
+               "first_rows_ms": round((first_rows_ns - STARTED_NS) / 1e6, 1)}
+    report = os.environ.get("LINKSAVER_STARTUP_REPORT", "")
+    if report:
+        print(json.dumps(timings), file=sys.stderr, flush=True)
+        if report == "exit":
+            root.after_idle(on_close)
+
+root.bind("<Map>", on_first_map)
+root.after(STARTUP_FALLBACK_MS, start_backend)
 header_entry.focus_set()
 
-# Fade-in effect (same as before)
-root.attributes('-alpha', 0.0)
+# Fade-in effect; LINKSAVER_FADE=0 skips it
 def fade_in(current_alpha=0.0):
     try:
         if current_alpha < 1.0:
@@ -425,6 +1473,15 @@ def fade_in(current_alpha=0.0):
         else:
             root.attributes('-alpha', 1.0)
     except tk.TclError: pass
-root.after(50, fade_in)
-
+if os.environ.get("LINKSAVER_FADE", "1") != "0":
+    root.attributes('-alpha', 0.0)
+    root.after(50, fade_in)
+
+root.bind("<F3>", show_cache_stats)
+root.bind("<F4>", toggle_perf_overlay)
+root.bind("<Shift-F4>", profile_next_search)
+root.bind("<Control-F4>", save_trace)
+if tracer.enabled:
+    update_perf_overlay()
+root.protocol("WM_DELETE_WINDOW", on_close)
 root.mainloop()
\ No newline at end of file
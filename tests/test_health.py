@@ -0,0 +1,85 @@
+"""HealthChecker against a local http.server stand-in: python -m unittest discover tests"""
+import http.server
+import os
+import socket
+import sqlite3
+import tempfile
+import threading
+import unittest
+
+from linksaver.health import HealthChecker
+from linksaver.store import LinkStore
+
+LAST_MODIFIED = "Wed, 21 Oct 2015 07:28:00 GMT"
+
+class Handler(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_HEAD(self):
+        self.server.conditional.append(self.headers.get("If-Modified-Since"))
+        if self.path == "/gone":
+            status = 404
+        elif self.headers.get("If-Modified-Since") == LAST_MODIFIED:
+            status = 304
+        else:
+            status = 200
+        self.send_response(status)
+        if status == 200:
+            self.send_header("Last-Modified", LAST_MODIFIED)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    do_GET = do_HEAD # The checker retries a HEAD that fails with GET; no body either way
+
+    def log_message(self, *args):
+        pass
+
+def refused_port():
+    """A localhost port nothing listens on."""
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+class HealthCheckerTest(unittest.TestCase):
+    def setUp(self):
+        self.server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.conditional = []
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.tmp.name, "links.db")
+        base = f"http://127.0.0.1:{self.server.server_address[1]}"
+        store = LinkStore(self.db_path)
+        self.ids = {name: store.add(name, url) for name, url in [
+            ("alive", f"{base}/ok"), ("gone", f"{base}/gone"), ("refused", f"http://127.0.0.1:{refused_port()}/")]}
+        store.close()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.tmp.cleanup()
+
+    def health(self):
+        conn = sqlite3.connect(self.db_path)
+        try:
+            return {link_id: (status, dead) for link_id, status, dead in
+                    conn.execute("SELECT link_id, status, dead FROM link_health")}
+        finally:
+            conn.close()
+
+    def test_statuses(self):
+        summary = HealthChecker(self.db_path, rate=0, timeout=5).run()
+        self.assertEqual((summary["checked"], summary["dead"], summary["cancelled"]), (3, 2, False))
+        health = self.health()
+        self.assertEqual(health[self.ids["alive"]], (200, 0))
+        self.assertEqual(health[self.ids["gone"]], (404, 1))
+        self.assertEqual(health[self.ids["refused"]], (None, 1))
+
+    def test_recheck_is_conditional(self):
+        HealthChecker(self.db_path, rate=0, timeout=5).run()
+        self.server.conditional.clear()
+        HealthChecker(self.db_path, rate=0, timeout=5, max_age=-1).run() # Everything is due again
+        self.assertIn(LAST_MODIFIED, self.server.conditional)
+        self.assertEqual(self.health()[self.ids["alive"]], (304, 0))
+
+if __name__ == "__main__":
+    unittest.main()